@@ -122,7 +122,7 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework_simplejwt.authentication.JWTAuthentication"
     ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "icu.pagination.KeysetPagination",
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
     "DEFAULT_RENDERER_CLASSES": [
         "djangorestframework_camel_case.render.CamelCaseJSONRenderer"
@@ -138,7 +138,30 @@ REST_FRAMEWORK = {
 # CORS settings
 CORS_ALLOWED_ORIGINS = ["http://localhost:3000"]
 
-# crontab stuff
+# model artifacts (`<dir>/<inference type>/<version>.npz`), the latest
+# version of every inference type is used unless pinned (e.g. "sepsis:3,aki:2")
+MODEL_ARTIFACTS_DIR = config("MODEL_ARTIFACTS_DIR", default=str(BASE_DIR / "artifacts"))
+MODEL_VERSIONS = config(
+    "MODEL_VERSIONS",
+    default="",
+    cast=lambda value: dict(x.split(":", 1) for x in value.split(",") if x),
+)
+MODEL_CACHE_SIZE = config("MODEL_CACHE_SIZE", default=8, cast=int)
+
+# how the inputs of predictions are stored: "packed" (deduplicated float32
+# vectors) or "json"
+PREDICTION_INPUTS = config("PREDICTION_INPUTS", default="packed")
+
+# event IDs are not committed in order, so the IDs missing within this many
+# IDs below the newest one are rechecked by the next inference run (events
+# committed later than that are only picked up with the next event of the
+# stay / patient)
+INFERENCE_ID_LOOKBACK = config("INFERENCE_ID_LOOKBACK", default=10_000, cast=int)
+
+# crontab stuff (the per-minute inference is a fallback for the resident
+# `manage.py inferenceworker`, both share the lock file and never overlap)
+INFERENCE_LOCK_FILE = config("INFERENCE_LOCK_FILE", default="/tmp/icu-inference.lock")
 CRONJOBS = [
     ("* * * * *", "predictors.cron.run_model_inference"),
-]
\ No newline at end of file
+    ("*/15 * * * *", "predictors.cron.reconcile_dashboard_counters"),
+]
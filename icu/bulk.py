@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from datetime import datetime
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.utils.timezone import get_current_timezone
+
+from .models import Patient
+from .versions import bump_table_version
+
+
+def get_field_converters(model, field_names):
+    # map fixture field names to model attribute names (foreign keys are
+    # assigned through their raw `<name>_id` attribute, so related rows
+    # are never fetched) together with the function parsing their values
+    converters = []
+    for name in field_names:
+        field = model._meta.get_field(name)
+        to_python = (
+            field.target_field.to_python if field.is_relation else field.to_python
+        )
+        converters.append((name, field.attname, to_python))
+
+    return converters
+
+
+def get_datetime_fields(model):
+    return [
+        field.attname
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.DateTimeField)
+    ]
+
+
+def localize_datetimes(instances, field_names):
+    # add default timezone to unaware date/time fields (the same thing
+    # the `pre_save` handlers in `signals.py` do, but for a whole batch)
+    tz = get_current_timezone()
+    for name in field_names:
+        for instance in instances:
+            value = getattr(instance, name)
+            if value is not None and value.tzinfo is None:
+                setattr(instance, name, value.replace(tzinfo=tz))
+
+
+def fill_patient_fields(instances):
+    # `bulk_create` bypasses `patient_pre_save_handler`, so the gender and
+    # date of birth are derived from the national ID here (in the same way
+    # the handler does it when loading fixtures)
+    for instance in instances:
+        _id = instance.national_id
+        assert type(_id) == str and len(_id) == 18
+        instance.gender = "M" if int(_id[-2]) % 2 == 1 else "F"
+        instance.date_of_birth = datetime.strptime(_id[6:14], r"%Y%m%d")
+
+
+def prepare_batch(model, instances):
+    if model is Patient:
+        fill_patient_fields(instances)
+
+    localize_datetimes(instances, get_datetime_fields(model))
+
+
+@contextmanager
+def preserve_timestamps(model):
+    # fields with `auto_now_add` (e.g. `Admission.admittime`) would be
+    # overwritten with the current time by `bulk_create`, so they are
+    # switched off while historical rows are being inserted
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    flags = [(field, field.auto_now, field.auto_now_add) for field in fields]
+
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in flags:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def reset_sequences(model):
+    # rows are inserted with their primary keys, which (unlike `loaddata`)
+    # leaves the sequences behind on PostgreSQL, so the next `create()`
+    # would get a duplicate key (a no-op on SQLite)
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+            cursor.execute(sql)
+
+
+def bulk_insert(model, instances, batch_size):
+    prepare_batch(model, instances)
+
+    with preserve_timestamps(model), transaction.atomic():
+        model.objects.bulk_create(instances, batch_size=batch_size)
+        reset_sequences(model)
+        # `bulk_create` sends no `post_save` signals
+        bump_table_version(model)
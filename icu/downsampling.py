@@ -0,0 +1,59 @@
+import numpy as np
+
+
+def get_bucket_edges(n, n_buckets, start=0):
+    # `n_buckets` contiguous index ranges of (almost) equal size
+    return np.linspace(start, n, n_buckets + 1).astype(int)
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keeps the first and last points and,
+    # for every bucket in between, the point forming the largest triangle
+    # with the previously kept point and the average of the next bucket
+    # (returns the indices of the kept points)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = get_bucket_edges(n - 1, n_out - 2, start=1)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i < n_out - 3:
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        # twice the triangle areas (the constant factor does not matter)
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        indices[i + 1] = a
+
+    return indices
+
+
+def minmax(x, y, n_out):
+    # keeps the minimum and the maximum of `n_out / 2` buckets, so spikes
+    # survive the downsampling (returns the sorted indices of kept points)
+    n = len(x)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+
+    edges = get_bucket_edges(n, n_out // 2)
+    indices = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        bucket = y[start:end]
+        indices.extend((start + bucket.argmin(), start + bucket.argmax()))
+
+    return np.unique(indices)
+
+
+DOWNSAMPLERS = {"lttb": lttb, "minmax": minmax}
@@ -0,0 +1,92 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+import random
+import statistics
+import time
+
+from icu.models import ChartEvent, LabEvent
+from icu.synthetic import create_icu_census
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads synthetic chart and lab events (rolled back afterwards) and "
+        "shows the query plans and timings of the bedside chart queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stays", type=int, default=50)
+        parser.add_argument("--items", type=int, default=10)
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=864,
+            help="Chart events per stay and item (5 minutes apart).",
+        )
+        parser.add_argument("--lab_items", type=int, default=20)
+        parser.add_argument(
+            "--lab_rows",
+            type=int,
+            default=12,
+            help="Lab events per patient and item (6 hours apart).",
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write("Loading synthetic rows...")
+            _, stays, icu_events, lab_items = create_icu_census(
+                options["stays"],
+                n_items=options["items"],
+                n_chart_rows=options["rows"],
+                n_lab_items=options["lab_items"],
+                n_lab_rows=options["lab_rows"],
+            )
+
+            # refresh the planner statistics of the new rows
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+            stay = random.choice(stays)
+            t1 = stay.intime + timedelta(hours=24)
+            t0 = t1 - timedelta(hours=12)
+            queries = {
+                "stay vitals in a time range": ChartEvent.objects.filter(
+                    icustay_id=stay.pk,
+                    icuevent_id__in=[e.pk for e in icu_events[:3]],
+                    charttime__range=(t0, t1),
+                )
+                .order_by("icuevent_id", "charttime")
+                .values_list("icuevent_id", "charttime", "valuenum"),
+                "latest stay vital": ChartEvent.objects.filter(
+                    icustay_id=stay.pk, icuevent_id=icu_events[0].pk
+                )
+                .order_by("-charttime")
+                .values_list("charttime", "valuenum")[:1],
+                "patient labs for an item": LabEvent.objects.filter(
+                    patient_id=stay.patient_id, lab_item_id=lab_items[0].pk
+                )
+                .order_by("charttime")
+                .values_list("charttime", "valuenum"),
+            }
+
+            for name, queryset in queries.items():
+                self.benchmark(name, queryset, options["repeat"])
+
+            transaction.set_rollback(True)
+
+    def benchmark(self, name, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            n_rows = len(list(queryset.all()))
+            timings.append((time.perf_counter() - started) * 1000)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name} ({n_rows} rows)"))
+        self.stdout.write(queryset.explain())
+        self.stdout.write(
+            f"median {statistics.median(timings):.2f} ms, "
+            f"min {min(timings):.2f} ms over {repeat} runs"
+        )
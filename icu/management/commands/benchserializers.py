@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+import time
+
+from icu.models import Patient
+from icu.serializers import PatientListSerializer, PatientSerializer
+from icu.synthetic import create_patients
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads synthetic patients (rolled back afterwards) and compares the "
+        "throughput of the patient list serializers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        sizes, repeat = options["sizes"], options["repeat"]
+
+        with transaction.atomic():
+            self.stdout.write("Loading synthetic patients...")
+            create_patients(max(sizes))
+
+            for size in sizes:
+                candidates = [
+                    (
+                        "PatientSerializer",
+                        lambda: PatientSerializer(
+                            Patient.objects.order_by("pk")[:size], many=True
+                        ).data,
+                    ),
+                    (
+                        "PatientListSerializer",
+                        lambda: PatientListSerializer(
+                            Patient.objects.with_age()
+                            .order_by("pk")
+                            .values(*PatientListSerializer.fields)[:size],
+                            many=True,
+                        ).data,
+                    ),
+                ]
+
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n{size:,} rows"))
+                outputs = []
+                for name, serialize in candidates:
+                    timings = []
+                    for _ in range(repeat):
+                        started = time.perf_counter()
+                        data = serialize()
+                        timings.append(time.perf_counter() - started)
+
+                    outputs.append([dict(row) for row in data])
+                    self.stdout.write(
+                        f"{name:>22}: {size / min(timings):,.0f} rows/sec "
+                        f"({min(timings) * 1000:.1f} ms)"
+                    )
+
+                if outputs[0] != outputs[1]:
+                    self.stdout.write(self.style.ERROR("The outputs differ."))
+
+            transaction.set_rollback(True)
@@ -0,0 +1,147 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from pathlib import Path
+
+import csv
+import json
+import time
+
+from icu.bulk import bulk_insert, get_field_converters
+
+
+def to_str(value):
+    return value
+
+
+def to_int(value):
+    return int(float(value))
+
+
+# the same field types understood by `scripts/csv_to_json.py`
+FIELD_TYPES = {"": to_str, "str": to_str, "int": to_int, "float": float}
+
+
+def compile_columns(model, config, headers):
+    # parse the `fields.copy` entries (`type:rename`) once, resolving
+    # every field to its column index, coercion function and model field
+    indices, coercions, field_names = [], [], []
+    for field_name, meta in config["fields"]["copy"].items():
+        meta = meta.split(":", 1)
+        field_type = meta[0]
+        rename_to = x if len(meta) == 2 and (x := meta[1]) else field_name
+
+        if field_type not in FIELD_TYPES:
+            raise CommandError(f"Unknown field type {field_type!r} for {field_name}.")
+        if field_name not in headers:
+            raise CommandError(f"Column {field_name!r} is missing in the CSV file.")
+
+        indices.append(headers.index(field_name))
+        coercions.append((FIELD_TYPES[field_type], field_type == "str"))
+        field_names.append(rename_to)
+
+    converters = get_field_converters(model, field_names)
+
+    # optional primary key if defined
+    if "pk" in config:
+        pk = model._meta.pk
+        indices.append(headers.index(config["pk"]))
+        coercions.append((to_str, False))
+        converters.append((pk.name, pk.attname, pk.to_python))
+
+    return [
+        (index, coerce, keep_empty, attname, to_python)
+        for index, (coerce, keep_empty), (_, attname, to_python) in zip(
+            indices, coercions, converters
+        )
+    ]
+
+
+def convert_batch(model, columns, rows):
+    # values are converted column by column for the whole batch, which
+    # keeps the per-row work down to building the model instance
+    attnames, values = [], []
+    for index, coerce, keep_empty, attname, to_python in columns:
+        raw = [row[index] for row in rows]
+        empty = "" if keep_empty else None
+        attnames.append(attname)
+        values.append([to_python(coerce(x)) if x else empty for x in raw])
+
+    return [model(**dict(zip(attnames, row))) for row in zip(*values)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads a CSV file straight into the database using a "
+        "`scripts/csv_to_json.py` config (no intermediate JSONL file)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("config", help="The path to the csv_to_json config file.")
+        parser.add_argument(
+            "--csv",
+            type=str,
+            help="Overrides the CSV path defined in the config file.",
+        )
+        parser.add_argument(
+            "--chunk_size",
+            type=int,
+            default=50_000,
+            help="The number of rows written per transaction.",
+        )
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            default=2_000,
+            help="The number of rows per INSERT statement.",
+        )
+
+    def handle(self, *args, **options):
+        with open(options["config"], "r", encoding="utf-8") as fd:
+            config = json.load(fd)
+
+        path = Path(options["csv"] or config["csv"])
+        if not path.is_file():
+            raise CommandError(f"CSV file {path} does not exist.")
+
+        try:
+            model = apps.get_model(config["model"])
+        except (LookupError, ValueError):
+            raise CommandError(f"Invalid model identifier: {config['model']}")
+
+        chunk_size, batch_size = options["chunk_size"], options["batch_size"]
+        loaded, started = 0, time.perf_counter()
+
+        def flush(rows):
+            nonlocal loaded
+            bulk_insert(model, convert_batch(model, columns, rows), batch_size)
+            loaded += len(rows)
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{path.name}: {loaded:,} rows ({loaded / elapsed:,.0f} rows/sec)"
+            )
+
+        with path.open("r", encoding="utf-8", newline="") as fd:
+            reader = csv.reader(fd)
+            headers = next(reader)
+            columns = compile_columns(model, config, headers)
+
+            rows = []
+            for row in reader:
+                if len(row) != len(headers):
+                    raise CommandError(
+                        f"Line {reader.line_num} has {len(row)} columns "
+                        f"(expected {len(headers)})."
+                    )
+
+                rows.append(row)
+                if len(rows) >= chunk_size:
+                    flush(rows)
+                    rows = []
+
+            if rows:
+                flush(rows)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Loaded {loaded:,} rows from {path.name}.")
+        )
@@ -0,0 +1,93 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from pathlib import Path
+
+import json
+import time
+
+from icu.bulk import bulk_insert, get_field_converters
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams JSONL fixtures (the output of `scripts/csv_to_json.py`) "
+        "into the database using batched inserts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixtures", nargs="+", help="Paths to JSONL fixtures.")
+        parser.add_argument(
+            "--chunk_size",
+            type=int,
+            default=50_000,
+            help="The number of rows written per transaction.",
+        )
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            default=2_000,
+            help="The number of rows per INSERT statement.",
+        )
+
+    def handle(self, *args, **options):
+        for fixture in options["fixtures"]:
+            path = Path(fixture)
+            if not path.is_file():
+                raise CommandError(f"Fixture {fixture} does not exist.")
+
+            self.load(path, options["chunk_size"], options["batch_size"])
+
+    def load(self, path, chunk_size, batch_size):
+        model, converters, chunk = None, None, []
+        loaded, started = 0, time.perf_counter()
+
+        def flush():
+            nonlocal loaded
+            if not chunk:
+                return
+
+            bulk_insert(model, chunk, batch_size)
+            loaded += len(chunk)
+            chunk.clear()
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{path.name}: {loaded:,} rows ({loaded / elapsed:,.0f} rows/sec)"
+            )
+
+        with path.open("r", encoding="utf-8") as fd:
+            for line in fd:
+                if not line.strip():
+                    continue
+
+                data = json.loads(line)
+                fields = data["fields"]
+
+                # the model (and thus the field layout) only changes
+                # between fixtures, so converters are built once per model
+                label = data["model"]
+                if model is None or model._meta.label_lower != label:
+                    flush()
+                    try:
+                        model = apps.get_model(label)
+                    except (LookupError, ValueError):
+                        raise CommandError(f"Invalid model identifier: {label}")
+                    converters = get_field_converters(model, fields.keys())
+
+                kwargs = {
+                    attname: to_python(fields[name])
+                    for name, attname, to_python in converters
+                }
+                if "pk" in data:
+                    kwargs[model._meta.pk.attname] = model._meta.pk.to_python(
+                        data["pk"]
+                    )
+
+                chunk.append(model(**kwargs))
+                if len(chunk) >= chunk_size:
+                    flush()
+
+        flush()
+        self.stdout.write(
+            self.style.SUCCESS(f"Loaded {loaded:,} rows from {path.name}.")
+        )
@@ -1,4 +1,7 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 
@@ -27,3 +30,22 @@ class AppUserManager(BaseUserManager):
             raise ValueError(_("Superuser must have is_superuser=True."))
 
         return self.create_user(username, email, password, **extra_fields)
+
+
+class PatientQuerySet(models.QuerySet):
+    def with_age(self):
+        # the same age as `Patient.age`, but computed by the database
+        today = timezone.localdate()
+        before_birthday = models.Q(date_of_birth__month__gt=today.month) | models.Q(
+            date_of_birth__month=today.month, date_of_birth__day__gt=today.day
+        )
+
+        return self.annotate(
+            age=today.year
+            - ExtractYear("date_of_birth")
+            - models.Case(
+                models.When(before_birthday, then=1),
+                default=0,
+                output_field=models.IntegerField(),
+            )
+        )
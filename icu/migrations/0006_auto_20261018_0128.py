@@ -0,0 +1,21 @@
+# Generated by Django 3.2.4 on 2026-10-17 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('icu', '0005_auto_20210703_1857'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chartevent',
+            index=models.Index(fields=['icustay', 'icuevent', 'charttime'], name='icu_chartev_icustay_b1c8f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='labevent',
+            index=models.Index(fields=['patient', 'lab_item', 'charttime'], name='icu_labeven_patient_a57f72_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.4 on 2026-10-17 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('icu', '0006_auto_20261018_0128'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('table', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='table')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='version')),
+                ('updated_at', models.DateTimeField(verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Table Version',
+                'verbose_name_plural': 'Table Versions',
+            },
+        ),
+    ]
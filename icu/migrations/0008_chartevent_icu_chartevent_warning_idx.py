@@ -0,0 +1,17 @@
+# Generated by Django 3.2.4 on 2026-10-17 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('icu', '0007_tableversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chartevent',
+            index=models.Index(condition=models.Q(('warning', True)), fields=['icustay'], name='icu_chartevent_warning_idx'),
+        ),
+    ]
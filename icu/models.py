@@ -15,7 +15,7 @@ from .choices import (
     MARITAL_STATUS_CHOICES,
     POSITION_CHOICES,
 )
-from .managers import AppUserManager
+from .managers import AppUserManager, PatientQuerySet
 from .validators import validate_national_id
 
 
@@ -74,6 +74,8 @@ class Patient(models.Model):
     address = models.TextField(_("address"), null=True, blank=True)
     dod = models.DateTimeField(_("Date of Death"), null=True, blank=True)
 
+    objects = PatientQuerySet.as_manager()
+
     @admin.display(ordering="date_of_birth", description=_("age"))
     def age(self):
         now, dob = timezone.now(), self.date_of_birth
@@ -417,6 +419,15 @@ class ChartEvent(models.Model):
         return f"【{patient_name}】{label} 指标（{chart_time}）"
 
     class Meta:
+        indexes = [
+            models.Index(fields=["icustay", "icuevent", "charttime"]),
+            # only the (few) warnings, so counting them never scans the table
+            models.Index(
+                fields=["icustay"],
+                condition=models.Q(warning=True),
+                name="icu_chartevent_warning_idx",
+            ),
+        ]
         verbose_name = _("ICU Chart Event")
         verbose_name_plural = _("ICU Chart Events")
 
@@ -590,5 +601,19 @@ class LabEvent(models.Model):
         return f"【{patient_name}】{label} 指标（{chart_time}）"
 
     class Meta:
+        indexes = [models.Index(fields=["patient", "lab_item", "charttime"])]
         verbose_name = _("Laboratory Event")
         verbose_name_plural = _("Laboratory Events")
+
+
+class TableVersion(models.Model):
+    table = models.CharField(_("table"), max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(_("version"), default=0)
+    updated_at = models.DateTimeField(_("Updated At"))
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
+
+    class Meta:
+        verbose_name = _("Table Version")
+        verbose_name_plural = _("Table Versions")
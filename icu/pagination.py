@@ -0,0 +1,34 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    # pages are fetched with `WHERE pk > <cursor> LIMIT n`, so deep pages
+    # cost the same as the first one (and there is no `COUNT(*)` query);
+    # requests with a `page` parameter fall back to page numbers for the
+    # screens which need the total count
+    ordering = "pk"
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    fallback_class = PageNumberPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        if self.fallback_class.page_query_param in request.query_params:
+            self.fallback = self.fallback_class()
+            ordering = self.get_ordering(request, queryset, view)
+            return self.fallback.paginate_queryset(
+                queryset.order_by(*ordering), request, view
+            )
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+
+        return super().get_paginated_response(data)
+
+
+class EventPagination(KeysetPagination):
+    # newest events first, ties on `charttime` are resolved by the cursor offset
+    ordering = ("-charttime", "-pk")
@@ -1,7 +1,10 @@
 from datetime import datetime
+from django.utils.translation import get_language
+from functools import lru_cache
 from rest_framework import serializers
 
-from .models import AppUser, Patient
+from .choices import ETHNICITY_CHOICES, GENDER_CHOICES
+from .models import AppUser, ChartEvent, LabEvent, Patient
 
 
 class PatientSerializer(serializers.HyperlinkedModelSerializer):
@@ -37,6 +40,56 @@ class PatientSerializer(serializers.HyperlinkedModelSerializer):
         ]
 
 
+PATIENT_CHOICES = {"gender": GENDER_CHOICES, "ethnicity": ETHNICITY_CHOICES}
+
+
+@lru_cache(maxsize=None)
+def get_choice_labels(field_name, language):
+    # the (lazy) choice labels translated once per language
+    return {value: str(label) for value, label in PATIENT_CHOICES[field_name]}
+
+
+class PatientListSerializer(serializers.BaseSerializer):
+    # read-only fast path for patient lists: renders the rows of
+    # `Patient.objects.with_age().values(*PatientListSerializer.fields)`
+    # with the same output as `PatientSerializer`, but without the
+    # per-field machinery of model serializers
+    fields = [
+        "subject_id",
+        "national_id",
+        "name",
+        "gender",
+        "date_of_birth",
+        "ethnicity",
+        "email",
+        "contact_no",
+        "address",
+        "dod",
+        "age",
+    ]
+    datetime_field = serializers.DateTimeField()
+
+    def to_representation(self, row):
+        language = get_language()
+        genders = get_choice_labels("gender", language)
+        ethnicities = get_choice_labels("ethnicity", language)
+        dod, date_of_birth = row["dod"], row["date_of_birth"]
+
+        return {
+            "subject_id": row["subject_id"],
+            "national_id": row["national_id"],
+            "name": row["name"],
+            "gender": genders.get(row["gender"], row["gender"]),
+            "date_of_birth": date_of_birth and date_of_birth.isoformat(),
+            "ethnicity": ethnicities.get(row["ethnicity"], row["ethnicity"]),
+            "email": row["email"],
+            "contact_no": row["contact_no"],
+            "address": row["address"],
+            "dod": dod and self.datetime_field.to_representation(dod),
+            "age": row["age"],
+        }
+
+
 class DoctorSerializer(serializers.HyperlinkedModelSerializer):
     name = serializers.SerializerMethodField()
     gender = serializers.SerializerMethodField()
@@ -66,3 +119,42 @@ class DoctorSerializer(serializers.HyperlinkedModelSerializer):
             "name",
             "is_active",
         ]
+
+
+class ChartEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChartEvent
+        fields = [
+            "id",
+            "patient",
+            "admission",
+            "icustay",
+            "icuevent",
+            "charttime",
+            "storetime",
+            "value",
+            "valuenum",
+            "valueuom",
+            "warning",
+        ]
+
+
+class LabEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LabEvent
+        fields = [
+            "labevent_id",
+            "patient",
+            "admission",
+            "specimen_id",
+            "lab_item",
+            "charttime",
+            "storetime",
+            "value",
+            "valuenum",
+            "valueuom",
+            "ref_range_lower",
+            "ref_range_upper",
+            "flag",
+            "priority",
+        ]
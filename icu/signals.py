@@ -1,12 +1,13 @@
 from datetime import datetime
 from django.core.exceptions import ValidationError
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils.timezone import get_current_timezone
 from django.utils.translation import gettext_lazy as _
 from id_validator import validator
 
 from .models import Admission, AppUser, ChartEvent, ICUStay, LabEvent, Patient
+from .versions import bump_table_version
 
 
 @receiver(pre_save, sender=AppUser)
@@ -107,3 +108,12 @@ def chartevent_pre_save_handler(sender, instance, **kwargs):
         instance.charttime = instance.charttime.replace(tzinfo=get_current_timezone())
     if instance.storetime is not None and instance.storetime.tzinfo is None:
         instance.storetime = instance.storetime.replace(tzinfo=get_current_timezone())
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+@receiver(post_save, sender=AppUser)
+@receiver(post_delete, sender=AppUser)
+def table_version_handler(sender, **kwargs):
+    # invalidates the ETags of the patient and doctor API resources
+    bump_table_version(sender)
@@ -0,0 +1,197 @@
+from datetime import timedelta
+from django.db.models import Max
+from django.utils import timezone
+
+import random
+
+from .bulk import bulk_insert
+from .models import (
+    Admission,
+    ChartEvent,
+    ICUEvent,
+    ICUStay,
+    LabEvent,
+    LabItem,
+    Patient,
+)
+
+# ISO 7064 MOD 11-2 weights of the first 17 digits of a national ID
+CHECKSUM_WEIGHTS = [pow(2, 17 - i, 11) for i in range(17)]
+BATCH_SIZE = 2_000
+
+
+def fake_national_id(index: int, gender: str) -> str:
+    # deterministic (and valid) IDs are enough for benchmarks, the sequence
+    # code parity encodes the gender as in real national IDs
+    order = 100 + (index % 400) * 2 + (gender == "M")
+    body = f"110101{1940 + index % 60}0101{order}"
+    check = (12 - sum(int(d) * w for d, w in zip(body, CHECKSUM_WEIGHTS)) % 11) % 11
+    return body + ("X" if check == 10 else str(check))
+
+
+def next_pk(model) -> int:
+    return (model.objects.aggregate(pk=Max("pk"))["pk"] or 0) + 1
+
+
+def create_patients(n: int) -> list:
+    start = next_pk(Patient)
+    patients = []
+    for i in range(n):
+        gender = random.choice("MF")
+        patients.append(
+            Patient(
+                subject_id=start + i,
+                national_id=fake_national_id(start + i, gender),
+                name=f"患者{start + i}",
+                ethnicity="汉族",
+            )
+        )
+
+    bulk_insert(Patient, patients, BATCH_SIZE)
+    return patients
+
+
+def create_stays(patients: list, intime) -> list:
+    # one admission with one (still open) ICU stay per patient
+    admission_pk, stay_pk = next_pk(Admission), next_pk(ICUStay)
+    admissions, stays = [], []
+    for i, patient in enumerate(patients):
+        admission = Admission(
+            hadm_id=admission_pk + i,
+            patient_id=patient.pk,
+            admittime=intime - timedelta(hours=6),
+            admission_type="ew emer.",
+            hospital_expire_flag=False,
+        )
+        admissions.append(admission)
+        stays.append(
+            ICUStay(
+                stay_id=stay_pk + i,
+                patient_id=patient.pk,
+                admission_id=admission.pk,
+                first_careunit="MICU",
+                last_careunit="MICU",
+                intime=intime,
+            )
+        )
+
+    bulk_insert(Admission, admissions, BATCH_SIZE)
+    bulk_insert(ICUStay, stays, BATCH_SIZE)
+    return stays
+
+
+def create_icu_events(n: int) -> list:
+    start = next_pk(ICUEvent)
+    events = [
+        ICUEvent(
+            itemid=start + i,
+            label=f"Vital Sign {i}",
+            abbreviation=f"VS{i}",
+            linksto="chartevents",
+            category="Routine Vital Signs",
+            param_type="Numeric",
+        )
+        for i in range(n)
+    ]
+
+    bulk_insert(ICUEvent, events, BATCH_SIZE)
+    return events
+
+
+def create_lab_items(n: int) -> list:
+    start = next_pk(LabItem)
+    items = [
+        LabItem(
+            itemid=start + i,
+            label=f"Lab Item {i}",
+            fluid="Blood",
+            category="Chemistry",
+        )
+        for i in range(n)
+    ]
+
+    bulk_insert(LabItem, items, BATCH_SIZE)
+    return items
+
+
+def create_chartevents(stays: list, icu_events: list, n_rows: int, interval):
+    # `n_rows` observations per stay and item, `interval` apart
+    batch = []
+    for stay in stays:
+        for event in icu_events:
+            for i in range(n_rows):
+                charttime = stay.intime + i * interval
+                value = random.gauss(80, 15)
+                batch.append(
+                    ChartEvent(
+                        patient_id=stay.patient_id,
+                        admission_id=stay.admission_id,
+                        icustay_id=stay.pk,
+                        icuevent_id=event.pk,
+                        charttime=charttime,
+                        storetime=charttime,
+                        value=f"{value:.0f}",
+                        valuenum=value,
+                        valueuom="bpm",
+                        warning=False,
+                    )
+                )
+
+            if len(batch) >= BATCH_SIZE * 10:
+                bulk_insert(ChartEvent, batch, BATCH_SIZE)
+                batch = []
+
+    bulk_insert(ChartEvent, batch, BATCH_SIZE)
+
+
+def create_labevents(stays: list, lab_items: list, n_rows: int, interval):
+    batch = []
+    for stay in stays:
+        for item in lab_items:
+            for i in range(n_rows):
+                charttime = stay.intime + i * interval
+                value = random.uniform(0.5, 1.5)
+                batch.append(
+                    LabEvent(
+                        patient_id=stay.patient_id,
+                        admission_id=stay.admission_id,
+                        specimen_id=i,
+                        lab_item_id=item.pk,
+                        charttime=charttime,
+                        storetime=charttime,
+                        value=f"{value:.2f}",
+                        valuenum=value,
+                        valueuom="mg/dL",
+                    )
+                )
+
+            if len(batch) >= BATCH_SIZE * 10:
+                bulk_insert(LabEvent, batch, BATCH_SIZE)
+                batch = []
+
+    bulk_insert(LabEvent, batch, BATCH_SIZE)
+
+
+def create_icu_census(
+    n_stays: int,
+    n_items: int = 5,
+    n_chart_rows: int = 100,
+    n_lab_items: int = 5,
+    n_lab_rows: int = 10,
+):
+    # patients with open ICU stays and their chart and lab events
+    # (the most recent observations are those of the last hour)
+    chart_interval = timedelta(minutes=5)
+    lab_interval = timedelta(hours=6)
+    intime = timezone.now() - max(
+        n_chart_rows * chart_interval, n_lab_rows * lab_interval
+    )
+
+    patients = create_patients(n_stays)
+    stays = create_stays(patients, intime)
+    icu_events = create_icu_events(n_items)
+    lab_items = create_lab_items(n_lab_items)
+    create_chartevents(stays, icu_events, n_chart_rows, chart_interval)
+    create_labevents(stays, lab_items, n_lab_rows, lab_interval)
+
+    return patients, stays, icu_events, lab_items
@@ -6,15 +6,24 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
-from .views import DoctorsViewSet, PatientsViewSet
+from .views import (
+    ChartEventsViewSet,
+    DoctorsViewSet,
+    LabEventsViewSet,
+    PatientsViewSet,
+    get_stay_vitals,
+)
 
 router = DefaultRouter()
 router.register(r"patients", PatientsViewSet)
 router.register(r"doctors", DoctorsViewSet)
+router.register(r"chart-events", ChartEventsViewSet)
+router.register(r"lab-events", LabEventsViewSet)
 
 
 urlpatterns = [
     path("jwt-token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("jwt-token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("icu-stays/<int:stay_id>/vitals/", get_stay_vitals),
     path("", include(router.urls)),
 ]
@@ -0,0 +1,28 @@
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TableVersion
+
+
+def get_table_version(model):
+    # (version, time of the last change) of the model's table
+    row = (
+        TableVersion.objects.filter(pk=model._meta.label_lower)
+        .values_list("version", "updated_at")
+        .first()
+    )
+    return row or (0, None)
+
+
+def bump_table_version(model):
+    # called whenever rows of the table are saved or deleted (note that
+    # `QuerySet.update` bypasses the signals, so it has to be called
+    # explicitly after bulk updates)
+    table, now = model._meta.label_lower, timezone.now()
+    updated = TableVersion.objects.filter(pk=table).update(
+        version=F("version") + 1, updated_at=now
+    )
+    if not updated:
+        TableVersion.objects.get_or_create(
+            table=table, defaults={"version": 1, "updated_at": now}
+        )
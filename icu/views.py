@@ -1,14 +1,265 @@
+from datetime import datetime
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from itertools import groupby
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from .models import Patient, AppUser
-from .serializers import DoctorSerializer, PatientSerializer
+import hashlib
+import numpy as np
 
+from .downsampling import DOWNSAMPLERS
+from .models import AppUser, ChartEvent, ICUEvent, ICUStay, LabEvent, Patient
+from .pagination import EventPagination
+from .serializers import (
+    ChartEventSerializer,
+    DoctorSerializer,
+    LabEventSerializer,
+    PatientListSerializer,
+    PatientSerializer,
+)
+from .versions import get_table_version
 
-class PatientsViewSet(ReadOnlyModelViewSet):
+MAX_POINTS = 10_000
+
+
+class ConditionalGetMixin:
+    # ETag and Last-Modified of list and detail views derived from the
+    # version of the table (bumped whenever its rows are saved or deleted),
+    # so unchanged polls are answered with `304 Not Modified` before
+    # running the query or rendering anything
+    def get_validators(self, request):
+        version, updated_at = get_table_version(self.queryset.model)
+
+        # the representation also depends on the URL, the renderer and
+        # (for the patient age) the current date
+        key = "|".join(
+            [
+                str(version),
+                str(timezone.localdate()),
+                request.get_full_path(),
+                request.accepted_media_type,
+            ]
+        )
+        etag = quote_etag(hashlib.blake2b(key.encode(), digest_size=16).hexdigest())
+
+        # the ages change at midnight, so the representation is never older
+        # than the start of the current day
+        today = timezone.make_aware(
+            datetime.combine(timezone.localdate(), datetime.min.time())
+        )
+        last_modified = int(max(updated_at or today, today).timestamp())
+
+        # HTTP dates have a resolution of one second, so a change within the
+        # same second would be answered with a false 304; such a recent
+        # Last-Modified is left out (the ETag remains the validator)
+        if last_modified >= int(timezone.now().timestamp()):
+            last_modified = None
+        return etag, last_modified
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+
+class PatientsViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != "list":
+            return queryset
+
+        # `pk` is kept for the keyset pagination cursor
+        return queryset.with_age().values("pk", *PatientListSerializer.fields)
 
-class DoctorsViewSet(ReadOnlyModelViewSet):
+    def get_serializer_class(self):
+        if self.action == "list":
+            return PatientListSerializer
+
+        return super().get_serializer_class()
+
+
+class DoctorsViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
     queryset = AppUser.objects.all()
     serializer_class = DoctorSerializer
+
+
+class ChartEventsViewSet(ReadOnlyModelViewSet):
+    # listed by `?stay=<stay_id>&items=<itemid>,...`, which (together with
+    # the keyset pagination on `charttime`) is served by the
+    # (icustay, icuevent, charttime) index, so the stay is required
+    # (ordering the whole table by `charttime` would be a full scan)
+    queryset = ChartEvent.objects.all()
+    serializer_class = ChartEventSerializer
+    pagination_class = EventPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != "list":
+            return queryset
+
+        params = self.request.query_params
+        queryset = queryset.filter(icustay_id=parse_id(params.get("stay"), "stay"))
+        if "items" in params:
+            queryset = queryset.filter(icuevent_id__in=parse_item_ids(params["items"]))
+
+        return queryset
+
+
+class LabEventsViewSet(ReadOnlyModelViewSet):
+    # listed by `?patient=<subject_id>&items=<itemid>,...` (served by the
+    # (patient, lab_item, charttime) index, so the patient is required)
+    queryset = LabEvent.objects.all()
+    serializer_class = LabEventSerializer
+    pagination_class = EventPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != "list":
+            return queryset
+
+        params = self.request.query_params
+        queryset = queryset.filter(
+            patient_id=parse_id(params.get("patient"), "patient")
+        )
+        if "items" in params:
+            queryset = queryset.filter(lab_item_id__in=parse_item_ids(params["items"]))
+
+        return queryset
+
+
+def parse_id(value, name):
+    if not value:
+        raise ValidationError({name: "This parameter is required."})
+
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "An integer ID."})
+
+
+def parse_item_ids(value):
+    try:
+        item_ids = [int(x) for x in value.split(",") if x]
+    except (AttributeError, ValueError):
+        raise ValidationError({"items": "A comma separated list of item IDs."})
+
+    if not item_ids:
+        raise ValidationError({"items": "At least one item ID is required."})
+
+    return list(dict.fromkeys(item_ids))
+
+
+def parse_time(params, name):
+    if not (value := params.get(name)):
+        return None
+
+    try:
+        time = parse_datetime(value)
+    except ValueError:
+        time = None
+    if time is None:
+        raise ValidationError({name: "An ISO 8601 date and time."})
+
+    return timezone.make_aware(time) if timezone.is_naive(time) else time
+
+
+def parse_points(value):
+    try:
+        points = int(value)
+    except ValueError:
+        points = 0
+    if not 3 <= points <= MAX_POINTS:
+        raise ValidationError({"points": f"An integer between 3 and {MAX_POINTS}."})
+
+    return points
+
+
+@api_view(["GET"])
+def get_stay_vitals(request, stay_id):
+    # numeric chart events of one ICU stay as arrays (epoch milliseconds and
+    # values) per item, optionally downsampled to `points` points per item
+    stay = get_object_or_404(ICUStay, pk=stay_id)
+    params = request.query_params
+
+    item_ids = parse_item_ids(params.get("items"))
+    start, end = parse_time(params, "start"), parse_time(params, "end")
+    method = params.get("downsample")
+    if method and method not in DOWNSAMPLERS:
+        raise ValidationError({"downsample": f"One of {', '.join(DOWNSAMPLERS)}."})
+    points = parse_points(params.get("points", "500"))
+
+    # served by the (icustay, icuevent, charttime) index
+    rows = ChartEvent.objects.filter(
+        icustay=stay, icuevent_id__in=item_ids, valuenum__isnull=False
+    )
+    if start:
+        rows = rows.filter(charttime__gte=start)
+    if end:
+        rows = rows.filter(charttime__lte=end)
+    rows = rows.order_by("icuevent_id", "charttime").values_list(
+        "icuevent_id", "charttime", "valuenum"
+    )
+
+    arrays = {}
+    for itemid, group in groupby(rows.iterator(), key=lambda row: row[0]):
+        group = list(group)
+        times = np.fromiter((row[1].timestamp() for row in group), float, len(group))
+        values = np.fromiter((row[2] for row in group), float, len(group))
+        arrays[itemid] = (times * 1000, values)
+
+    items = ICUEvent.objects.in_bulk(item_ids)
+    series = []
+    for itemid in item_ids:
+        if itemid not in items:
+            continue
+
+        times, values = arrays.get(itemid, (np.empty(0), np.empty(0)))
+        count = len(times)
+        if method:
+            indices = DOWNSAMPLERS[method](times, values, points)
+            times, values = times[indices], values[indices]
+
+        series.append(
+            {
+                "itemid": itemid,
+                "label": items[itemid].label,
+                "unitname": items[itemid].unitname,
+                "count": count,
+                "times": times.astype(np.int64).tolist(),
+                "values": values.tolist(),
+            }
+        )
+
+    return Response(
+        {
+            "stay_id": stay.pk,
+            "start": start,
+            "end": end,
+            "downsample": method,
+            "series": series,
+        }
+    )
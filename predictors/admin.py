@@ -1,10 +1,36 @@
 from django.contrib import admin
+from django.utils.html import format_html
+from django.utils.translation import ugettext_lazy as _
 
-from .models import ModelPrediction
+from .models import InferenceRun, ModelPrediction
+
+import json
 
 
 class ModelPredictionAdmin(admin.ModelAdmin):
-    raw_id_fields = ("patient",)
+    raw_id_fields = ("patient", "feature_vector")
+    readonly_fields = ("decoded_inputs",)
+
+    @admin.display(description=_("Decoded Inputs"))
+    def decoded_inputs(self, obj):
+        inputs = json.dumps(obj.get_inputs(), ensure_ascii=False, indent=2)
+        return format_html("<pre>{}</pre>", inputs)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("feature_vector__schema")
+
+
+class InferenceRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "started_at",
+        "duration",
+        "open_stays",
+        "scored_stays",
+        "skipped_stays",
+        "predictions",
+    )
+    ordering = ("-started_at",)
 
 
-admin.site.register(ModelPrediction, ModelPredictionAdmin)
\ No newline at end of file
+admin.site.register(ModelPrediction, ModelPredictionAdmin)
+admin.site.register(InferenceRun, InferenceRunAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PredictorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'predictors'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,51 @@
+from django.db.models import F
+from django.utils import timezone
+
+from icu.models import AppUser, ChartEvent, ICUStay, Patient
+
+from .models import DashboardCounter
+
+# the live definition of every counter, only used for reconciliation
+COUNTER_QUERIES = {
+    "patients": lambda: Patient.objects.all(),
+    "icu_patients": lambda: ICUStay.objects.filter(outtime__isnull=True),
+    "warnings": lambda: ChartEvent.objects.filter(warning=True),
+    "doctors": lambda: AppUser.objects.all(),
+}
+
+
+def increment_counter(name, delta):
+    # a single `UPDATE` (so concurrent increments cannot be lost), missing
+    # counters are created by the next reconciliation
+    if delta:
+        DashboardCounter.objects.filter(pk=name).update(value=F("value") + delta)
+
+
+def reconcile_counters():
+    # recompute every counter with `COUNT(*)`, which fixes the drift caused
+    # by writes that send no signals (`bulk_create`, `QuerySet.update`, ...),
+    # and move the trend baselines to the current values once a day
+    now = timezone.now()
+    today = timezone.localdate(now)
+
+    for name, get_queryset in COUNTER_QUERIES.items():
+        value = get_queryset().count()
+        counter, created = DashboardCounter.objects.get_or_create(
+            pk=name, defaults={"value": value}
+        )
+        counter.value = value
+        counter.reconciled_at = now
+        if counter.baseline_date != today:
+            counter.baseline = value
+            counter.baseline_date = today
+        counter.save()
+
+
+def get_counters():
+    # counters which don't exist yet (before their first reconciliation)
+    # are reported as zeros instead of counting the tables in the request
+    counters = {counter.pk: counter for counter in DashboardCounter.objects.all()}
+    for name in COUNTER_QUERIES:
+        counters.setdefault(name, DashboardCounter(pk=name))
+
+    return counters
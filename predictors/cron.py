@@ -1,13 +1,17 @@
-from icu.models import Patient
-
-from .models import ModelPrediction
+from .counters import reconcile_counters
+from .inference import run_inference
+from .locks import inference_lock
+from .rollups import get_recent_days, rebuild_rollups
 
 
 def run_model_inference():
-    patient = Patient.objects.first()
-    prediction = ModelPrediction.objects.create(
-        patient=patient,
-        inputs={"hey": "yo!"},
-        output=0.9999,
-    )
-    prediction.save()
+    # fallback for deployments without `manage.py inferenceworker`, skipped
+    # while a worker (or a previous overlong run) holds the lock
+    with inference_lock() as acquired:
+        if acquired:
+            run_inference()
+
+
+def reconcile_dashboard_counters():
+    reconcile_counters()
+    rebuild_rollups(start=get_recent_days(14)[0])
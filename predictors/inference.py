@@ -0,0 +1,393 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from typing import NamedTuple
+
+import numpy as np
+import time
+
+from icu.models import ChartEvent, ICUStay, LabEvent
+
+from .models import InferenceRun, InferenceWatermark, ModelPrediction
+from .registry import registry
+from .vectors import get_schema, store_vectors
+
+
+class Feature(NamedTuple):
+    name: str
+    table: str
+    itemid: int
+    # used for standardization (and as the value of missing measurements)
+    mean: float
+    std: float
+
+
+# the latest value of every feature (MIMIC-IV item IDs)
+FEATURES = [
+    Feature("heart_rate", "chartevents", 220045, 85.0, 18.0),
+    Feature("sbp", "chartevents", 220179, 120.0, 22.0),
+    Feature("map", "chartevents", 220181, 80.0, 14.0),
+    Feature("resp_rate", "chartevents", 220210, 19.0, 5.0),
+    Feature("spo2", "chartevents", 220277, 96.0, 3.0),
+    Feature("temperature", "chartevents", 223761, 98.6, 1.5),
+    Feature("creatinine", "labevents", 50912, 1.2, 1.0),
+    Feature("wbc", "labevents", 51301, 10.0, 5.0),
+    Feature("lactate", "labevents", 50813, 1.8, 1.2),
+    Feature("platelets", "labevents", 51265, 220.0, 90.0),
+]
+CHART_WINDOW = timedelta(hours=6)
+LAB_WINDOW = timedelta(hours=48)
+
+# logistic regression weights (in the order of `FEATURES`) and bias of
+# every inference type, used when the registry has no artifact for it
+COEFFICIENTS = {
+    "sepsis": ([0.6, -0.4, -0.5, 0.5, -0.4, 0.4, 0.3, 0.6, 0.8, -0.3], -2.0),
+    "mi": ([0.7, 0.2, -0.3, 0.2, -0.3, 0.0, 0.2, 0.1, 0.4, 0.0], -2.5),
+    "vancomycin": ([0.3, -0.2, -0.2, 0.3, -0.2, 0.6, 0.2, 0.7, 0.3, -0.1], -1.5),
+    "aki": ([0.2, -0.3, -0.6, 0.1, -0.1, 0.0, 1.2, 0.1, 0.4, 0.0], -2.0),
+    "mortality": ([0.5, -0.5, -0.6, 0.5, -0.6, 0.1, 0.4, 0.3, 0.9, -0.4], -3.0),
+}
+INFERENCE_TYPES = [value for value, _ in ModelPrediction.INFERENCE_TYPE_CHOICES]
+
+
+def get_feature_columns(table):
+    return {f.itemid: i for i, f in enumerate(FEATURES) if f.table == table}
+
+
+def fill_latest(matrix, rows, row_index, columns):
+    # `rows` are (entity, itemid, value) tuples ordered by entity, itemid and
+    # time, so the last row of every (entity, itemid) run is the latest value
+    if not rows:
+        return
+
+    entities, itemids, values = (np.array(x) for x in zip(*rows))
+    keys = entities.astype(np.int64) * (max(columns) + 1) + itemids
+    last = np.append(keys[1:] != keys[:-1], True)
+
+    entity_rows = np.array([row_index[x] for x in entities[last]])
+    item_columns = np.array([columns[x] for x in itemids[last]])
+    matrix[entity_rows, item_columns] = values[last].astype(float)
+
+
+def build_feature_matrix(stay_ids, patient_ids, now):
+    # stays x features, NaN for features without a recent measurement
+    matrix = np.full((len(stay_ids), len(FEATURES)), np.nan)
+
+    chart_columns = get_feature_columns("chartevents")
+    rows = list(
+        ChartEvent.objects.filter(
+            icustay_id__in=stay_ids,
+            icuevent_id__in=list(chart_columns),
+            charttime__gte=now - CHART_WINDOW,
+            valuenum__isnull=False,
+        )
+        .order_by("icustay_id", "icuevent_id", "charttime")
+        .values_list("icustay_id", "icuevent_id", "valuenum")
+    )
+    fill_latest(matrix, rows, {x: i for i, x in enumerate(stay_ids)}, chart_columns)
+
+    # lab events belong to patients (a patient with several open stays
+    # gets the same lab values in all of them)
+    lab_columns = get_feature_columns("labevents")
+    unique_patients = list(dict.fromkeys(patient_ids))
+    labs = np.full((len(unique_patients), len(FEATURES)), np.nan)
+    rows = list(
+        LabEvent.objects.filter(
+            patient_id__in=unique_patients,
+            lab_item_id__in=list(lab_columns),
+            charttime__gte=now - LAB_WINDOW,
+            valuenum__isnull=False,
+        )
+        .order_by("patient_id", "lab_item_id", "charttime")
+        .values_list("patient_id", "lab_item_id", "valuenum")
+    )
+    patient_index = {x: i for i, x in enumerate(unique_patients)}
+    fill_latest(labs, rows, patient_index, lab_columns)
+
+    lab_indices = list(lab_columns.values())
+    patient_rows = [patient_index[x] for x in patient_ids]
+    matrix[:, lab_indices] = labs[np.ix_(patient_rows, lab_indices)]
+    return matrix
+
+
+def get_models():
+    # (inference types x features weights, biases, versions) of the models
+    # in the registry (cached in-process, so only checked for changes here)
+    names = tuple(f.name for f in FEATURES)
+    weights, biases, versions = [], [], {}
+
+    for inference_type in INFERENCE_TYPES:
+        model = registry.get(inference_type)
+        if model is None:
+            weights.append(COEFFICIENTS[inference_type][0])
+            biases.append(COEFFICIENTS[inference_type][1])
+            versions[inference_type] = "builtin"
+            continue
+
+        if model.features != names:
+            raise ValueError(
+                f"The features of the {inference_type} model (version "
+                f"{model.version}) do not match the inference features."
+            )
+        weights.append(model.weights)
+        biases.append(model.bias)
+        versions[inference_type] = model.version
+
+    return np.array(weights, dtype=float), np.array(biases), versions
+
+
+def score(matrix, weights, biases):
+    # stays x inference types probabilities in one vectorized pass
+    means = np.array([f.mean for f in FEATURES])
+    stds = np.array([f.std for f in FEATURES])
+    standardized = np.nan_to_num((matrix - means) / stds, nan=0.0)
+    return 1 / (1 + np.exp(-(standardized @ weights.T + biases)))
+
+
+def get_new_data(model, group_field, itemid_field, table, ids, low, high):
+    # the last relevant event ID of every stay / patient within (low, high],
+    # which is a range scan on the primary key (only the rows that arrived
+    # since the oldest watermark are read)
+    columns = get_feature_columns(table)
+    pk = model._meta.pk.name
+    return dict(
+        model.objects.filter(
+            **{
+                f"{pk}__gt": low,
+                f"{pk}__lte": high,
+                f"{group_field}__in": ids,
+                f"{itemid_field}__in": list(columns),
+            }
+        )
+        .values_list(group_field)
+        .annotate(last=Max(pk))
+        .order_by()
+    )
+
+
+def get_missing_ids(model, high, pending):
+    # the IDs up to `high` which are not committed (yet): the gaps within
+    # `INFERENCE_ID_LOOKBACK` IDs below it and the previously pending IDs
+    # which are still missing (rolled back IDs expire with the lookback)
+    low = max(high - settings.INFERENCE_ID_LOOKBACK, 0)
+    present = model.objects.filter(pk__gt=low, pk__lte=high).values_list(
+        "pk", flat=True
+    )
+    candidates = set(range(low + 1, high + 1)).union(x for x in pending if x > low)
+    return sorted(candidates.difference(present))
+
+
+def get_late_data(model, group_field, itemid_field, table, ids, committed):
+    # the stays / patients with relevant events among the IDs which were
+    # pending in the previous run and have been committed since
+    if not committed:
+        return set()
+
+    columns = get_feature_columns(table)
+    return set(
+        model.objects.filter(
+            **{
+                f"{model._meta.pk.name}__in": committed,
+                f"{group_field}__in": ids,
+                f"{itemid_field}__in": list(columns),
+            }
+        ).values_list(group_field, flat=True)
+    )
+
+
+def get_stale_stays(stays, chart_high, lab_high, late_charts=(), late_labs=()):
+    # stays without a watermark for every inference type, with relevant
+    # chart / lab events newer than their watermarks (event IDs are used
+    # instead of times since late entries can have old chart times), or with
+    # relevant events committed below their watermarks (`late_*` IDs)
+    stay_ids = [stay_id for stay_id, _ in stays]
+    patient_ids = list({patient_id for _, patient_id in stays})
+
+    watermarks = {}
+    rows = InferenceWatermark.objects.filter(icustay_id__in=stay_ids).values_list(
+        "icustay_id", "last_chartevent_id", "last_labevent_id"
+    )
+    for stay_id, chart_id, lab_id in rows:
+        counts, low_chart, low_lab = watermarks.get(stay_id, (0, chart_id, lab_id))
+        watermarks[stay_id] = (
+            counts + 1,
+            min(low_chart, chart_id),
+            min(low_lab, lab_id),
+        )
+
+    late_stays = get_late_data(
+        ChartEvent, "icustay_id", "icuevent_id", "chartevents", stay_ids, late_charts
+    )
+    late_patients = get_late_data(
+        LabEvent, "patient_id", "lab_item_id", "labevents", patient_ids, late_labs
+    )
+
+    complete = {
+        (stay_id, patient_id)
+        for stay_id, patient_id in stays
+        if watermarks.get(stay_id, (0,))[0] == len(INFERENCE_TYPES)
+        and stay_id not in late_stays
+        and patient_id not in late_patients
+    }
+    if not complete:
+        return list(stays)
+
+    new_charts = get_new_data(
+        ChartEvent,
+        "icustay_id",
+        "icuevent_id",
+        "chartevents",
+        [stay_id for stay_id, _ in complete],
+        min(watermarks[stay_id][1] for stay_id, _ in complete),
+        chart_high,
+    )
+    new_labs = get_new_data(
+        LabEvent,
+        "patient_id",
+        "lab_item_id",
+        "labevents",
+        list({patient_id for _, patient_id in complete}),
+        min(watermarks[stay_id][2] for stay_id, _ in complete),
+        lab_high,
+    )
+
+    stale = []
+    for stay_id, patient_id in stays:
+        if (stay_id, patient_id) not in complete:
+            stale.append((stay_id, patient_id))
+            continue
+
+        _, chart_id, lab_id = watermarks[stay_id]
+        if (
+            new_charts.get(stay_id, 0) > chart_id
+            or new_labs.get(patient_id, 0) > lab_id
+        ):
+            stale.append((stay_id, patient_id))
+
+    return stale
+
+
+def update_watermarks(stay_ids, chart_high, lab_high, now):
+    existing = set(
+        InferenceWatermark.objects.filter(icustay_id__in=stay_ids).values_list(
+            "icustay_id", "inference_type"
+        )
+    )
+    InferenceWatermark.objects.filter(icustay_id__in=stay_ids).update(
+        last_chartevent_id=chart_high, last_labevent_id=lab_high, scored_at=now
+    )
+    InferenceWatermark.objects.bulk_create(
+        [
+            InferenceWatermark(
+                icustay_id=stay_id,
+                inference_type=inference_type,
+                last_chartevent_id=chart_high,
+                last_labevent_id=lab_high,
+                scored_at=now,
+            )
+            for stay_id in stay_ids
+            for inference_type in INFERENCE_TYPES
+            if (stay_id, inference_type) not in existing
+        ],
+        batch_size=1_000,
+    )
+
+
+def advance_watermarks(stay_ids, chart_high, lab_high):
+    # the skipped stays had no relevant events up to the high IDs either,
+    # so their watermarks move along (without being scored), which keeps
+    # the scan of the next run starting at the last run's high IDs
+    InferenceWatermark.objects.filter(icustay_id__in=stay_ids).update(
+        last_chartevent_id=chart_high, last_labevent_id=lab_high
+    )
+
+
+def run_inference(now=None):
+    # score the open ICU stays with new data since their last scoring,
+    # returns the (stored) statistics of the run
+    started = time.perf_counter()
+    now = now or timezone.now()
+    stays = list(
+        ICUStay.objects.filter(outtime__isnull=True)
+        .order_by("stay_id")
+        .values_list("stay_id", "patient_id")
+    )
+
+    # the events up to these IDs are consumed by this run, except for the
+    # ones which are not committed yet (these are checked again by the next
+    # run, since IDs are not necessarily committed in order)
+    chart_high = ChartEvent.objects.aggregate(high=Max("pk"))["high"] or 0
+    lab_high = LabEvent.objects.aggregate(high=Max("pk"))["high"] or 0
+    previous = InferenceRun.objects.order_by("-started_at", "-pk").first()
+    pending = previous.pending_event_ids if previous else {}
+    missing = {
+        "chartevents": get_missing_ids(
+            ChartEvent, chart_high, pending.get("chartevents", [])
+        ),
+        "labevents": get_missing_ids(LabEvent, lab_high, pending.get("labevents", [])),
+    }
+    late_charts, late_labs = (
+        sorted(set(pending.get(table, [])).difference(missing[table]))
+        for table in ["chartevents", "labevents"]
+    )
+
+    stale = []
+    if stays:
+        stale = get_stale_stays(stays, chart_high, lab_high, late_charts, late_labs)
+    weights, biases, versions = get_models()
+
+    predictions = []
+    if stale:
+        stay_ids, patient_ids = (list(x) for x in zip(*stale))
+        matrix = build_feature_matrix(stay_ids, patient_ids, now)
+        predictions = build_predictions(
+            patient_ids, matrix, score(matrix, weights, biases)
+        )
+
+    skipped = set(stays).difference(stale)
+    with transaction.atomic():
+        ModelPrediction.objects.bulk_create(predictions, batch_size=1_000)
+        if stale:
+            update_watermarks(stay_ids, chart_high, lab_high, now)
+        if skipped:
+            advance_watermarks(
+                [stay_id for stay_id, _ in skipped], chart_high, lab_high
+            )
+
+        return InferenceRun.objects.create(
+            started_at=now,
+            duration=time.perf_counter() - started,
+            open_stays=len(stays),
+            scored_stays=len(stale),
+            skipped_stays=len(stays) - len(stale),
+            predictions=len(predictions),
+            model_versions=versions,
+            pending_event_ids=missing,
+        )
+
+
+def build_predictions(patient_ids, matrix, outputs):
+    # the inputs are stored as (deduplicated) packed feature vectors, which
+    # all inference types of a stay share, unless `PREDICTION_INPUTS` is "json"
+    names = [f.name for f in FEATURES]
+    if settings.PREDICTION_INPUTS == "json":
+        inputs = [
+            {"inputs": {n: None if np.isnan(x) else x for n, x in zip(names, row)}}
+            for row in matrix.tolist()
+        ]
+    else:
+        schema = get_schema(names)
+        inputs = [{"feature_vector_id": x} for x in store_vectors(schema, matrix)]
+
+    return [
+        ModelPrediction(
+            patient_id=patient_id,
+            inference_type=inference_type,
+            output=float(output),
+            **row_inputs,
+        )
+        for patient_id, row_inputs, row in zip(patient_ids, inputs, outputs)
+        for inference_type, output in zip(INFERENCE_TYPES, row)
+    ]
@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+from django.conf import settings
+
+import fcntl
+
+
+@contextmanager
+def inference_lock():
+    # an exclusive (non-blocking) lock on `INFERENCE_LOCK_FILE`, yields
+    # whether it was acquired; it is released when the process exits, so a
+    # crashed worker never leaves a stale lock behind
+    with open(settings.INFERENCE_LOCK_FILE, "a") as fd:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
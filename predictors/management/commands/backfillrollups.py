@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from predictors.rollups import get_recent_days, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily dashboard rollups from admissions and ICU stays."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Only rebuild the last N days (all history by default).",
+        )
+
+    def handle(self, *args, **options):
+        start = get_recent_days(options["days"])[0] if options["days"] else None
+        n_days = rebuild_rollups(start=start)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the rollups of {n_days} days."))
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+import signal
+import threading
+import time
+import traceback
+
+from predictors.inference import run_inference
+from predictors.locks import inference_lock
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the model inference on a fixed interval in a resident process "
+        "(instead of a new `crontab run` process every minute)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=float, default=60, help="Seconds between runs."
+        )
+        parser.add_argument(
+            "--max_runs",
+            type=int,
+            default=0,
+            help="Exit after N runs (runs forever by default).",
+        )
+
+    def handle(self, *args, **options):
+        interval, max_runs = options["interval"], options["max_runs"]
+        if interval <= 0:
+            raise CommandError("The interval must be positive.")
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+        # the lock is held for the lifetime of the worker, so the crontab
+        # fallback skips its runs while a worker is alive
+        with inference_lock() as acquired:
+            if not acquired:
+                raise CommandError(
+                    "Another inference worker (or crontab run) holds the lock."
+                )
+
+            self.stdout.write(f"Running the inference every {interval:g} seconds.")
+            self.run_forever(interval, max_runs, stop)
+
+    def run_forever(self, interval, max_runs, stop):
+        # runs are scheduled on a fixed grid (start + k * interval), so the
+        # time spent running does not make the schedule drift, and ticks
+        # missed by an overlong run are skipped instead of piling up
+        next_run, runs = time.monotonic(), 0
+
+        while not stop.is_set():
+            # long-lived processes must drop connections the database closed
+            close_old_connections()
+            try:
+                run = run_inference()
+                self.stdout.write(
+                    f"{run.started_at:%Y-%m-%d %H:%M:%S}: scored {run.scored_stays} "
+                    f"of {run.open_stays} stays ({run.skipped_stays} skipped, "
+                    f"{run.predictions} predictions) in {run.duration:.2f}s"
+                )
+            except Exception:
+                self.stderr.write(traceback.format_exc())
+            finally:
+                close_old_connections()
+
+            runs += 1
+            if max_runs and runs >= max_runs:
+                break
+
+            next_run += interval
+            now = time.monotonic()
+            if now > next_run:
+                missed = int((now - next_run) // interval) + 1
+                next_run += missed * interval
+                self.stderr.write(f"Skipped {missed} run(s) after an overlong run.")
+
+            stop.wait(next_run - now)
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.4 on 2026-10-17 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictors', '0002_modelprediction_inference_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('name', models.CharField(choices=[('patients', 'Patients'), ('icu_patients', 'ICU Patients'), ('warnings', 'Warnings'), ('doctors', 'Doctors')], max_length=50, primary_key=True, serialize=False, verbose_name='name')),
+                ('value', models.BigIntegerField(default=0, verbose_name='value')),
+                ('baseline', models.BigIntegerField(default=0, help_text='The value at the start of the day (the trend is relative to it).', verbose_name='baseline')),
+                ('baseline_date', models.DateField(null=True, verbose_name='Baseline Date')),
+                ('reconciled_at', models.DateTimeField(null=True, verbose_name='Reconciled At')),
+            ],
+            options={
+                'verbose_name': 'Dashboard Counter',
+                'verbose_name_plural': 'Dashboard Counters',
+            },
+        ),
+    ]
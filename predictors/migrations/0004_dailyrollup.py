@@ -0,0 +1,27 @@
+# Generated by Django 3.2.4 on 2026-10-17 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictors', '0003_dashboardcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False, verbose_name='date')),
+                ('admissions', models.BigIntegerField(default=0, verbose_name='admissions')),
+                ('icu_admissions', models.BigIntegerField(default=0, verbose_name='ICU admissions')),
+                ('discharges', models.BigIntegerField(default=0, verbose_name='discharges')),
+                ('icu_discharges', models.BigIntegerField(default=0, verbose_name='ICU discharges')),
+            ],
+            options={
+                'verbose_name': 'Daily Rollup',
+                'verbose_name_plural': 'Daily Rollups',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.4 on 2026-10-17 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictors', '0004_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='modelprediction',
+            index=models.Index(fields=['patient', 'inference_type', 'added_at'], name='predictors__patient_e112b6_idx'),
+        ),
+    ]
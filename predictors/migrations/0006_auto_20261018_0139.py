@@ -0,0 +1,54 @@
+# Generated by Django 3.2.4 on 2026-10-17 17:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('icu', '0007_tableversion'),
+        ('predictors', '0005_modelprediction_predictors__patient_e112b6_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InferenceRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(verbose_name='Started At')),
+                ('duration', models.FloatField(help_text='In seconds.', verbose_name='duration')),
+                ('open_stays', models.IntegerField(verbose_name='Open Stays')),
+                ('scored_stays', models.IntegerField(verbose_name='Scored Stays')),
+                ('skipped_stays', models.IntegerField(verbose_name='Skipped Stays')),
+                ('predictions', models.IntegerField(verbose_name='predictions')),
+            ],
+            options={
+                'verbose_name': 'Inference Run',
+                'verbose_name_plural': 'Inference Runs',
+            },
+        ),
+        migrations.CreateModel(
+            name='InferenceWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inference_type', models.CharField(choices=[('sepsis', 'Sepsis'), ('mi', 'Myocardial Infarction (MI)'), ('vancomycin', 'Vancomycin'), ('aki', 'Acute Kidney Injury (AKI)'), ('mortality', 'Mortality')], max_length=50, verbose_name='Inference Type')),
+                ('last_chartevent_id', models.BigIntegerField(default=0, verbose_name='Last Chart Event ID')),
+                ('last_labevent_id', models.BigIntegerField(default=0, verbose_name='Last Laboratory Event ID')),
+                ('scored_at', models.DateTimeField(verbose_name='Scored At')),
+                ('icustay', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='icu.icustay')),
+            ],
+            options={
+                'verbose_name': 'Inference Watermark',
+                'verbose_name_plural': 'Inference Watermarks',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inferencerun',
+            index=models.Index(fields=['started_at'], name='predictors__started_604026_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='inferencewatermark',
+            constraint=models.UniqueConstraint(fields=('icustay', 'inference_type'), name='unique_stay_watermark'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2026-10-17 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictors', '0006_auto_20261018_0139'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inferencerun',
+            name='model_versions',
+            field=models.JSONField(default=dict, verbose_name='Model Versions'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.4 on 2026-10-17 17:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictors', '0007_inferencerun_model_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureSchema',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('names', models.JSONField(verbose_name='names')),
+                ('digest', models.CharField(max_length=64, unique=True, verbose_name='digest')),
+            ],
+            options={
+                'verbose_name': 'Feature Schema',
+                'verbose_name_plural': 'Feature Schemas',
+            },
+        ),
+        migrations.AlterField(
+            model_name='modelprediction',
+            name='inputs',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='FeatureVector',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True, verbose_name='digest')),
+                ('data', models.BinaryField(verbose_name='data')),
+                ('schema', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='predictors.featureschema')),
+            ],
+            options={
+                'verbose_name': 'Feature Vector',
+                'verbose_name_plural': 'Feature Vectors',
+            },
+        ),
+        migrations.AddField(
+            model_name='modelprediction',
+            name='feature_vector',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='predictors.featurevector'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.4 on 2026-10-17 17:55
+
+from django.db import migrations
+
+
+def create_counters(apps, schema_editor):
+    # zeros until the first reconciliation, so the dashboard never counts
+    # the tables itself
+    DashboardCounter = apps.get_model('predictors', 'DashboardCounter')
+    for name, _ in DashboardCounter._meta.get_field('name').choices:
+        DashboardCounter.objects.get_or_create(pk=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictors', '0008_auto_20261018_0142'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_counters, migrations.RunPython.noop),
+    ]
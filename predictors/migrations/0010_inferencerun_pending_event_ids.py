@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2026-10-17 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictors', '0009_create_dashboard_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inferencerun',
+            name='pending_event_ids',
+            field=models.JSONField(default=dict, help_text='The event IDs which were not committed yet (per table).', verbose_name='Pending Event IDs'),
+        ),
+    ]
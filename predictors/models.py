@@ -1,7 +1,43 @@
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
-from icu.models import Patient
+from icu.models import ICUStay, Patient
+
+import numpy as np
+
+
+class FeatureSchema(models.Model):
+    names = models.JSONField(_("names"))
+    digest = models.CharField(_("digest"), max_length=64, unique=True)
+
+    def __str__(self):
+        return f"#{self.pk} ({len(self.names)} features)"
+
+    class Meta:
+        verbose_name = _("Feature Schema")
+        verbose_name_plural = _("Feature Schemas")
+
+
+class FeatureVector(models.Model):
+    # model inputs packed as little-endian float32 (NaN for missing values)
+    # in the order of the schema, shared by all predictions with the same inputs
+    schema = models.ForeignKey(FeatureSchema, on_delete=models.PROTECT)
+    digest = models.CharField(_("digest"), max_length=64, unique=True)
+    data = models.BinaryField(_("data"))
+
+    def decode(self):
+        values = np.frombuffer(bytes(self.data), dtype="<f4").tolist()
+        return {
+            name: None if value != value else value
+            for name, value in zip(self.schema.names, values)
+        }
+
+    def __str__(self):
+        return f"#{self.pk}"
+
+    class Meta:
+        verbose_name = _("Feature Vector")
+        verbose_name_plural = _("Feature Vectors")
 
 
 class ModelPrediction(models.Model):
@@ -18,16 +54,117 @@ class ModelPrediction(models.Model):
         max_length=50,
         choices=INFERENCE_TYPE_CHOICES,
     )
-    inputs = models.JSONField()
+    # the inputs are either stored as JSON or (by default) as a packed vector
+    inputs = models.JSONField(null=True, blank=True)
+    feature_vector = models.ForeignKey(
+        FeatureVector, null=True, blank=True, on_delete=models.PROTECT
+    )
     output = models.FloatField()
     added_at = models.DateTimeField(_("Added At"), auto_now_add=True)
 
+    def get_inputs(self):
+        if self.feature_vector_id is not None:
+            return self.feature_vector.decode()
+
+        return self.inputs
+
     def __str__(self):
         return f"【{self.patient.name}】的"
 
     class Meta:
         indexes = [
             models.Index(fields=["added_at"]),
+            # latest prediction of a patient for each inference type
+            models.Index(fields=["patient", "inference_type", "added_at"]),
         ]
         verbose_name = _("Model Prediction")
         verbose_name_plural = _("Model Predictions")
+
+
+class DashboardCounter(models.Model):
+    NAME_CHOICES = (
+        ("patients", _("Patients")),
+        ("icu_patients", _("ICU Patients")),
+        ("warnings", _("Warnings")),
+        ("doctors", _("Doctors")),
+    )
+    name = models.CharField(
+        _("name"), max_length=50, primary_key=True, choices=NAME_CHOICES
+    )
+    value = models.BigIntegerField(_("value"), default=0)
+    baseline = models.BigIntegerField(
+        _("baseline"),
+        default=0,
+        help_text=_("The value at the start of the day (the trend is relative to it)."),
+    )
+    baseline_date = models.DateField(_("Baseline Date"), null=True)
+    reconciled_at = models.DateTimeField(_("Reconciled At"), null=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+    class Meta:
+        verbose_name = _("Dashboard Counter")
+        verbose_name_plural = _("Dashboard Counters")
+
+
+class DailyRollup(models.Model):
+    date = models.DateField(_("date"), primary_key=True)
+    admissions = models.BigIntegerField(_("admissions"), default=0)
+    icu_admissions = models.BigIntegerField(_("ICU admissions"), default=0)
+    discharges = models.BigIntegerField(_("discharges"), default=0)
+    icu_discharges = models.BigIntegerField(_("ICU discharges"), default=0)
+
+    def __str__(self):
+        return str(self.date)
+
+    class Meta:
+        verbose_name = _("Daily Rollup")
+        verbose_name_plural = _("Daily Rollups")
+
+
+class InferenceWatermark(models.Model):
+    icustay = models.ForeignKey(ICUStay, on_delete=models.CASCADE)
+    inference_type = models.CharField(
+        _("Inference Type"),
+        max_length=50,
+        choices=ModelPrediction.INFERENCE_TYPE_CHOICES,
+    )
+    last_chartevent_id = models.BigIntegerField(_("Last Chart Event ID"), default=0)
+    last_labevent_id = models.BigIntegerField(_("Last Laboratory Event ID"), default=0)
+    scored_at = models.DateTimeField(_("Scored At"))
+
+    def __str__(self):
+        return f"{self.icustay_id} ({self.inference_type})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["icustay", "inference_type"], name="unique_stay_watermark"
+            )
+        ]
+        verbose_name = _("Inference Watermark")
+        verbose_name_plural = _("Inference Watermarks")
+
+
+class InferenceRun(models.Model):
+    started_at = models.DateTimeField(_("Started At"))
+    duration = models.FloatField(_("duration"), help_text=_("In seconds."))
+    open_stays = models.IntegerField(_("Open Stays"))
+    scored_stays = models.IntegerField(_("Scored Stays"))
+    skipped_stays = models.IntegerField(_("Skipped Stays"))
+    predictions = models.IntegerField(_("predictions"))
+    model_versions = models.JSONField(_("Model Versions"), default=dict)
+    pending_event_ids = models.JSONField(
+        _("Pending Event IDs"),
+        default=dict,
+        help_text=_("The event IDs which were not committed yet (per table)."),
+    )
+
+    def __str__(self):
+        return f"{self.started_at}: {self.scored_stays}/{self.open_stays}"
+
+    class Meta:
+        indexes = [models.Index(fields=["started_at"])]
+        verbose_name = _("Inference Run")
+        verbose_name_plural = _("Inference Runs")
@@ -0,0 +1,60 @@
+from django.db.models import F, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from icu.models import ICUStay
+
+from .models import ModelPrediction
+
+HIGH_RISK_THRESHOLD = 0.5
+
+
+def get_latest_output(inference_type):
+    # one index seek on (patient, inference_type, added_at) per row
+    return Subquery(
+        ModelPrediction.objects.filter(
+            patient_id=OuterRef("patient_id"), inference_type=inference_type
+        )
+        .order_by("-added_at")
+        .values("output")[:1],
+        output_field=FloatField(),
+    )
+
+
+def get_ranked_icu_stays(inference_type=None, limit=10):
+    # open ICU stays with the latest prediction output of every inference
+    # type, ranked by the one of `inference_type` or the highest of them
+    inference_types = [value for value, _ in ModelPrediction.INFERENCE_TYPE_CHOICES]
+    latest = {f"latest_{t}": get_latest_output(t) for t in inference_types}
+
+    if inference_type is not None:
+        risk = F(f"latest_{inference_type}")
+    else:
+        # `GREATEST` returns NULL for any NULL argument on some databases
+        risk = Greatest(
+            *[Coalesce(F(name), Value(-1.0)) for name in latest],
+            output_field=FloatField(),
+        )
+
+    stays = (
+        ICUStay.objects.filter(outtime__isnull=True)
+        .annotate(**latest)
+        .annotate(risk=risk)
+        .order_by(F("risk").desc(nulls_last=True), "intime")
+        .values(
+            "stay_id",
+            "patient_id",
+            "patient__name",
+            "last_careunit",
+            "intime",
+            "risk",
+            *latest,
+        )[:limit]
+    )
+
+    stays = list(stays)
+    for stay in stays:
+        stay["predictions"] = {t: stay.pop(f"latest_{t}") for t in inference_types}
+        if stay["risk"] is not None and stay["risk"] < 0:
+            stay["risk"] = None
+
+    return stays
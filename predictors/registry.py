@@ -0,0 +1,157 @@
+from collections import OrderedDict
+from django.conf import settings
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import os
+import struct
+import threading
+import zipfile
+
+
+class LinearModel(NamedTuple):
+    inference_type: str
+    version: str
+    features: tuple
+    weights: np.ndarray
+    bias: float
+
+
+def get_version_key(version):
+    # numeric versions are compared as numbers (so "10" comes after "9")
+    return (0, int(version), "") if version.isdigit() else (1, 0, version)
+
+
+def mmap_npz_member(path, info):
+    # members of uncompressed `.npz` files (`np.savez`) are plain `.npy` files
+    # inside the archive, so they can be memory-mapped at their offset
+    with open(path, "rb") as fd:
+        fd.seek(info.header_offset)
+        name_length, extra_length = struct.unpack("<HH", fd.read(30)[26:30])
+        fd.seek(info.header_offset + 30 + name_length + extra_length)
+
+        version = np.lib.format.read_magic(fd)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fd)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fd)
+        offset = fd.tell()
+
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode="r",
+        offset=offset,
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+def load_arrays(path, mmap_threshold):
+    arrays = {}
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            name = info.filename[: -len(".npy")]
+            if (
+                info.file_size >= mmap_threshold
+                and info.compress_type == zipfile.ZIP_STORED
+            ):
+                arrays[name] = mmap_npz_member(path, info)
+            else:
+                with archive.open(info) as fd:
+                    arrays[name] = np.lib.format.read_array(fd)
+
+    return arrays
+
+
+class ModelRegistry:
+    # model artifacts are `<root>/<inference type>/<version>.npz` files with
+    # `features` (names), `weights` and `bias` arrays; the latest version is
+    # used unless `MODEL_VERSIONS` pins one, and the loaded models are kept
+    # in a bounded LRU cache which reloads an artifact when its mtime changes
+    def __init__(self, root, versions=None, cache_size=8, mmap_threshold=1 << 20):
+        self.root = Path(root)
+        self.versions = versions or {}
+        self.cache_size = cache_size
+        self.mmap_threshold = mmap_threshold
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_artifact_path(self, inference_type):
+        if version := self.versions.get(inference_type):
+            path = self.root / inference_type / f"{version}.npz"
+            if not path.is_file():
+                raise FileNotFoundError(f"Model artifact {path} does not exist.")
+            return path
+
+        try:
+            versions = [
+                entry.name[: -len(".npz")]
+                for entry in os.scandir(self.root / inference_type)
+                if entry.is_file() and entry.name.endswith(".npz")
+            ]
+        except FileNotFoundError:
+            return None
+
+        if not versions:
+            return None
+
+        version = max(versions, key=get_version_key)
+        return self.root / inference_type / f"{version}.npz"
+
+    def get(self, inference_type):
+        # the model of an inference type (`None` if there is no artifact),
+        # costs a `stat` call when the artifact is cached
+        path = self.get_artifact_path(inference_type)
+        if path is None:
+            return None
+
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            if (entry := self.cache.get(path)) and entry[0] == signature:
+                self.cache.move_to_end(path)
+                return entry[1]
+
+            arrays = load_arrays(path, self.mmap_threshold)
+            model = LinearModel(
+                inference_type=inference_type,
+                version=path.stem,
+                features=tuple(str(x) for x in arrays["features"]),
+                weights=arrays["weights"],
+                bias=float(arrays["bias"]),
+            )
+
+            self.cache[path] = (signature, model)
+            self.cache.move_to_end(path)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+            return model
+
+
+def save_artifact(root, inference_type, version, features, weights, bias):
+    # written uncompressed (so large weights can be memory-mapped) through a
+    # temporary file, so workers never load a partially written artifact
+    path = Path(root) / inference_type / f"{version}.npz"
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as fd:
+        np.savez(
+            fd,
+            features=np.array(features),
+            weights=np.asarray(weights, dtype=np.float64),
+            bias=np.float64(bias),
+        )
+    os.replace(tmp_path, path)
+    return path
+
+
+registry = ModelRegistry(
+    settings.MODEL_ARTIFACTS_DIR,
+    versions=settings.MODEL_VERSIONS,
+    cache_size=settings.MODEL_CACHE_SIZE,
+)
@@ -0,0 +1,78 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from icu.models import Admission, ICUStay
+
+from .models import DailyRollup
+
+# rollup column: the model and the date/time field counted per day
+ROLLUP_FIELDS = {
+    "admissions": (Admission, "admittime"),
+    "icu_admissions": (ICUStay, "intime"),
+    "discharges": (Admission, "dischtime"),
+    "icu_discharges": (ICUStay, "outtime"),
+}
+
+
+def get_recent_days(n_days):
+    today = timezone.localdate()
+    return [today - timedelta(days=i) for i in range(n_days - 1, -1, -1)]
+
+
+def increment_rollup(column, time, delta):
+    # days are calendar days in `TIME_ZONE`
+    if time is None or not delta:
+        return
+
+    day = timezone.localdate(time)
+    rollups = DailyRollup.objects.filter(pk=day)
+    if not rollups.update(**{column: F(column) + delta}):
+        DailyRollup.objects.get_or_create(pk=day)
+        rollups.update(**{column: F(column) + delta})
+
+
+def move_rollup(column, old, new):
+    # the time of a row changed from `old` to `new` (either may be None)
+    if old is not None and new is not None:
+        if timezone.localdate(old) == timezone.localdate(new):
+            return
+
+    increment_rollup(column, old, -1)
+    increment_rollup(column, new, 1)
+
+
+def rebuild_rollups(start=None):
+    # recompute the rollups of all days (or of the days since `start`) from
+    # the admissions and ICU stays, which also fixes the drift caused by
+    # writes that send no signals
+    counts = defaultdict(dict)
+    for column, (model, field) in ROLLUP_FIELDS.items():
+        queryset = model.objects.filter(**{f"{field}__isnull": False})
+        if start is not None:
+            queryset = queryset.filter(**{f"{field}__date__gte": start})
+
+        rows = (
+            queryset.annotate(day=TruncDate(field))
+            .values("day")
+            .annotate(n=Count("pk"))
+            .values_list("day", "n")
+        )
+        for day, n in rows:
+            counts[day][column] = n
+
+    with transaction.atomic():
+        rollups = DailyRollup.objects.all()
+        if start is not None:
+            rollups = rollups.filter(date__gte=start)
+        rollups.delete()
+
+        DailyRollup.objects.bulk_create(
+            [DailyRollup(date=day, **columns) for day, columns in counts.items()],
+            batch_size=1_000,
+        )
+
+    return len(counts)
@@ -0,0 +1,15 @@
+from rest_framework import serializers
+
+from .models import ModelPrediction
+
+
+class ModelPredictionSerializer(serializers.ModelSerializer):
+    # decoded from the packed feature vector (or the legacy JSON inputs)
+    inputs = serializers.SerializerMethodField()
+
+    def get_inputs(self, obj):
+        return obj.get_inputs()
+
+    class Meta:
+        model = ModelPrediction
+        fields = ["id", "patient", "inference_type", "inputs", "output", "added_at"]
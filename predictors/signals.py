@@ -0,0 +1,100 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from icu.models import Admission, AppUser, ChartEvent, ICUStay, Patient
+
+from .counters import increment_counter
+from .rollups import ROLLUP_FIELDS, increment_rollup, move_rollup
+
+
+def get_stored_values(instance, *fields):
+    # the stored values of an updated row (`None` for new rows), needed to
+    # tell whether e.g. a stay was closed or a warning was cleared
+    if instance._state.adding:
+        return None
+
+    return type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def update_rollups(sender, instance, stored):
+    for column, (model, field) in ROLLUP_FIELDS.items():
+        if model is sender:
+            old = stored[field] if stored else None
+            move_rollup(column, old, getattr(instance, field))
+
+
+@receiver(post_save, sender=Patient)
+def patient_post_save_handler(sender, instance, created, **kwargs):
+    if created:
+        increment_counter("patients", 1)
+
+
+@receiver(post_delete, sender=Patient)
+def patient_post_delete_handler(sender, instance, **kwargs):
+    increment_counter("patients", -1)
+
+
+@receiver(post_save, sender=AppUser)
+def appuser_post_save_handler(sender, instance, created, **kwargs):
+    if created:
+        increment_counter("doctors", 1)
+
+
+@receiver(post_delete, sender=AppUser)
+def appuser_post_delete_handler(sender, instance, **kwargs):
+    increment_counter("doctors", -1)
+
+
+@receiver(pre_save, sender=Admission)
+def admission_pre_save_handler(sender, instance, **kwargs):
+    instance._stored = get_stored_values(instance, "admittime", "dischtime")
+
+
+@receiver(post_save, sender=Admission)
+def admission_post_save_handler(sender, instance, **kwargs):
+    update_rollups(sender, instance, instance._stored)
+
+
+@receiver(post_delete, sender=Admission)
+def admission_post_delete_handler(sender, instance, **kwargs):
+    increment_rollup("admissions", instance.admittime, -1)
+    increment_rollup("discharges", instance.dischtime, -1)
+
+
+@receiver(pre_save, sender=ICUStay)
+def icustay_pre_save_handler(sender, instance, **kwargs):
+    instance._stored = get_stored_values(instance, "intime", "outtime")
+
+
+@receiver(post_save, sender=ICUStay)
+def icustay_post_save_handler(sender, instance, **kwargs):
+    stored = instance._stored
+    was_open = stored is not None and stored["outtime"] is None
+    increment_counter("icu_patients", (instance.outtime is None) - was_open)
+    update_rollups(sender, instance, stored)
+
+
+@receiver(post_delete, sender=ICUStay)
+def icustay_post_delete_handler(sender, instance, **kwargs):
+    if instance.outtime is None:
+        increment_counter("icu_patients", -1)
+
+    increment_rollup("icu_admissions", instance.intime, -1)
+    increment_rollup("icu_discharges", instance.outtime, -1)
+
+
+@receiver(pre_save, sender=ChartEvent)
+def chartevent_pre_save_handler(sender, instance, **kwargs):
+    instance._stored = get_stored_values(instance, "warning")
+
+
+@receiver(post_save, sender=ChartEvent)
+def chartevent_post_save_handler(sender, instance, **kwargs):
+    stored = instance._stored
+    had_warning = stored is not None and stored["warning"]
+    increment_counter("warnings", bool(instance.warning) - had_warning)
+
+
+# there is deliberately no `post_delete` handler for chart events: it would
+# disable the fast (single query) cascade deletes of patients and stays,
+# deleted warnings are picked up by the reconciliation instead
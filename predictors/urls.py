@@ -1,9 +1,20 @@
-from django.urls import path
+from django.urls import include, path
 
-from .views import get_dashboard_info, get_dashboard_graph, get_dashboard_patients
+from rest_framework.routers import SimpleRouter
+
+from .views import (
+    PredictionsViewSet,
+    get_dashboard_info,
+    get_dashboard_graph,
+    get_dashboard_patients,
+)
+
+router = SimpleRouter()
+router.register(r"predictions", PredictionsViewSet)
 
 urlpatterns = [
     path("dashboard-info/", get_dashboard_info),
     path("dashboard-graph/", get_dashboard_graph),
     path("dashboard-patients/", get_dashboard_patients),
+    path("", include(router.urls)),
 ]
@@ -0,0 +1,50 @@
+import hashlib
+import json
+import numpy as np
+
+from .models import FeatureSchema, FeatureVector
+
+
+def get_digest(data):
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+
+def get_schema(names):
+    names = list(names)
+    digest = get_digest(json.dumps(names).encode())
+    schema, _ = FeatureSchema.objects.get_or_create(
+        digest=digest, defaults={"names": names}
+    )
+    return schema
+
+
+def store_vectors(schema, matrix):
+    # the IDs of the rows of `matrix` as packed feature vectors, identical
+    # vectors (e.g. the inputs of an unchanged stay) are only stored once
+    packed = [row.tobytes() for row in np.asarray(matrix, dtype="<f4")]
+    prefix = schema.pk.to_bytes(8, "little")
+    digests = [get_digest(prefix + data) for data in packed]
+
+    ids = dict(
+        FeatureVector.objects.filter(digest__in=set(digests)).values_list(
+            "digest", "pk"
+        )
+    )
+    missing = {
+        digest: FeatureVector(schema=schema, digest=digest, data=data)
+        for digest, data in zip(digests, packed)
+        if digest not in ids
+    }
+
+    if missing:
+        # (conflicts are vectors stored by a concurrent run in the meantime)
+        FeatureVector.objects.bulk_create(
+            missing.values(), batch_size=1_000, ignore_conflicts=True
+        )
+        ids.update(
+            FeatureVector.objects.filter(digest__in=list(missing)).values_list(
+                "digest", "pk"
+            )
+        )
+
+    return [ids[digest] for digest in digests]
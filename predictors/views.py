@@ -1,59 +1,101 @@
+from django.utils import timezone
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from icu.models import Patient
+from icu.pagination import KeysetPagination
 
-import numpy as np
-import random
+from .counters import get_counters
+from .models import DailyRollup, ModelPrediction
+from .queries import HIGH_RISK_THRESHOLD, get_ranked_icu_stays
+from .rollups import get_recent_days
+from .serializers import ModelPredictionSerializer
 
 
 @api_view(["GET"])
 def get_dashboard_info(_):
-    patients = random.randint(100, 1000)
-    icu_patients = random.randint(100, 400)
-    warnings = random.randint(100, 200)
-    doctors = random.randint(50, 100)
-    trend_patients = random.randint(-100, 100)
-    trend_icu_patients = random.randint(-100, 100)
-    trend_warnings = random.randint(-40, 40)
-    trend_doctors = random.randint(-20, 20)
+    # maintained by the signal handlers in `signals.py` (and reconciled
+    # periodically), so this is a single query however large the tables are
+    counters = get_counters()
 
-    return Response(
-        {
-            "patients": patients,
-            "icu_patients": icu_patients,
-            "warnings": warnings,
-            "doctors": doctors,
-            "trend_patients": trend_patients,
-            "trend_icu_patients": trend_icu_patients,
-            "trend_warnings": trend_warnings,
-            "trend_doctors": trend_doctors,
-        }
-    )
+    data = {}
+    for name in ["patients", "icu_patients", "warnings", "doctors"]:
+        counter = counters[name]
+        data[name] = counter.value
+        data[f"trend_{name}"] = counter.value - counter.baseline
+
+    return Response(data)
 
 
 @api_view(["GET"])
 def get_dashboard_graph(_):
+    # the last 14 days (oldest first) from the precomputed daily rollups
+    days = get_recent_days(14)
+    rollups = DailyRollup.objects.in_bulk(days)
+    empty = DailyRollup()
+
     return Response(
         {
-            "patients": np.random.gamma(1, 2, 14).tolist(),
-            "icu_patients": np.random.gamma(1, 2, 14).tolist(),
-            "discharged_patients": np.random.gamma(1, 2, 14).tolist(),
+            "dates": days,
+            "patients": [rollups.get(day, empty).admissions for day in days],
+            "icu_patients": [rollups.get(day, empty).icu_admissions for day in days],
+            "discharged_patients": [rollups.get(day, empty).discharges for day in days],
         }
     )
 
 
 @api_view(["GET"])
-def get_dashboard_patients(_):
+def get_dashboard_patients(request):
+    # patients currently in the ICU ranked by their latest prediction of
+    # `?inference_type=` (by the highest of their latest predictions if not given)
+    inference_type = request.query_params.get("inference_type")
+    inference_types = dict(ModelPrediction.INFERENCE_TYPE_CHOICES)
+    if inference_type and inference_type not in inference_types:
+        raise ValidationError(
+            {"inference_type": f"One of {', '.join(inference_types)}."}
+        )
+
+    now = timezone.now()
+    stays = get_ranked_icu_stays(inference_type, limit=10)
+
     return Response(
         [
             {
-                "subject_id": patient.subject_id,
-                "name": patient.name,
-                "ward_id": random.randint(101, 999),
-                "duration": random.randint(10, 50),
-                "is_high_risk": bool(random.getrandbits(1)),
+                "subject_id": stay["patient_id"],
+                "name": stay["patient__name"],
+                "stay_id": stay["stay_id"],
+                "ward_id": stay["last_careunit"],
+                # hours since the ICU admission
+                "duration": int((now - stay["intime"]).total_seconds() // 3600),
+                "risk": stay["risk"],
+                "predictions": stay["predictions"],
+                "is_high_risk": (stay["risk"] or 0) >= HIGH_RISK_THRESHOLD,
             }
-            for patient in Patient.objects.all()[:10]
+            for stay in stays
         ]
     )
+
+
+class PredictionPagination(KeysetPagination):
+    ordering = ("-added_at", "-pk")
+
+
+class PredictionsViewSet(ReadOnlyModelViewSet):
+    # filtered by `?patient=<subject_id>&inference_type=<type>`
+    queryset = ModelPrediction.objects.select_related("feature_vector__schema")
+    serializer_class = ModelPredictionSerializer
+    pagination_class = PredictionPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+
+        if patient := params.get("patient"):
+            if not patient.isdigit():
+                raise ValidationError({"patient": "An integer ID."})
+            queryset = queryset.filter(patient_id=patient)
+        if inference_type := params.get("inference_type"):
+            queryset = queryset.filter(inference_type=inference_type)
+
+        return queryset
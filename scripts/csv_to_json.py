@@ -1,9 +1,13 @@
+from multiprocessing import Pool
 from pathlib import Path
 from tqdm import tqdm
 
 import argparse
 import csv
 import json
+import random
+import shutil
+import time
 
 
 def get_config(path):
@@ -16,64 +20,289 @@ def parse_args():
     parser.add_argument(
         "--config", type=str, required=True, help="The path to config file."
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of worker processes (the CSV is split into byte ranges).",
+    )
+    parser.add_argument(
+        "--keep_parts",
+        action="store_true",
+        help="Keep the numbered part files instead of concatenating them.",
+    )
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        default=0,
+        help="Only measure the conversion speed on N synthetic rows.",
+    )
 
     return parser.parse_args()
 
 
+def convert_row(config, headers, row):
+    # reference (uncompiled) conversion, kept for `--benchmark`
+    assert len(headers) == len(row)
+
+    # convert csv row to a python dictionary
+    row_as_dict = {k: v for k, v in zip(headers, row)}
+
+    # initialize fixture data
+    data = {
+        "model": config["model"],
+        "fields": {},
+    }
+
+    # add optional primary key if defined
+    if "pk" in config:
+        data["pk"] = row_as_dict[config["pk"]]
+
+    # copy required fields
+    for field_name, meta in config["fields"]["copy"].items():
+        # parse meta information
+        meta = meta.split(":", 1)
+        field_type = meta[0]
+        rename_to = x if len(meta) == 2 and (x := meta[1]) else field_name
+
+        # optional values must be transformed to None
+        value = row_as_dict[field_name]
+        if not value:
+            if field_type == "str":
+                value = ""
+            else:
+                value = None
+
+        # perform type conversion (if necessary)
+        if value is not None:
+            if field_type == "int":
+                value = int(float(value))
+            elif field_type == "float":
+                value = float(value)
+
+        # add field
+        data["fields"][rename_to] = value
+
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+def identity(value):
+    return value
+
+
+def to_int(value):
+    return int(float(value))
+
+
+COERCIONS = {"int": to_int, "float": float}
+
+
+def compile_converter(config, headers):
+    # parse the field metadata once and bind every field to its column
+    # index and coercion function, so converting a row is a single pass
+    model = config["model"]
+    n_columns = len(headers)
+    pk_index = headers.index(config["pk"]) if "pk" in config else None
+
+    fields = []
+    for field_name, meta in config["fields"]["copy"].items():
+        meta = meta.split(":", 1)
+        field_type = meta[0]
+        rename_to = x if len(meta) == 2 and (x := meta[1]) else field_name
+
+        # optional values must be transformed to None
+        empty = "" if field_type == "str" else None
+        coerce = COERCIONS.get(field_type, identity)
+        fields.append((headers.index(field_name), rename_to, coerce, empty))
+
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+
+    def convert(row):
+        assert len(row) == n_columns
+
+        data = {
+            "model": model,
+            "fields": {
+                rename_to: coerce(value) if (value := row[index]) else empty
+                for index, rename_to, coerce, empty in fields
+            },
+        }
+        if pk_index is not None:
+            data["pk"] = row[pk_index]
+
+        return dumps(data) + "\n"
+
+    return convert
+
+
+def get_byte_ranges(in_file, n_ranges, block_size=1 << 20):
+    # split the file (without its header) into ranges that start and end
+    # right after a newline outside of quoted values, so each worker only
+    # sees complete rows; the quotes are counted in one sequential pass
+    # (escaped quotes `""` don't change whether a value is open)
+    size = in_file.stat().st_size
+
+    with in_file.open("rb") as fd:
+        fd.readline()
+        start = position = fd.tell()
+        step = max((size - start) // n_ranges, 1)
+
+        boundaries = [start]
+        target, quoted = start + step, False
+        while target < size and (block := fd.read(block_size)):
+            # `quoted` is the state at `scanned` (an index into the block)
+            scanned = 0
+            while (offset := target - position) < len(block):
+                newline = block.find(b"\n", max(offset, scanned))
+                if newline < 0:
+                    break
+
+                quoted ^= block.count(b'"', scanned, newline) % 2 == 1
+                scanned = newline
+                if not quoted:
+                    boundaries.append(position + newline + 1)
+                    target = boundaries[-1] + step
+                else:
+                    target = position + newline + 1
+
+            quoted ^= block.count(b'"', scanned) % 2 == 1
+            position += len(block)
+
+    if boundaries[-1] >= size:
+        boundaries.pop()
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def get_part_file(out_file, index):
+    return out_file.with_name(f"{out_file.stem}.part-{index:05d}{out_file.suffix}")
+
+
+def read_lines(in_file, start, end):
+    with in_file.open("rb") as fd:
+        fd.seek(start)
+        position = start
+
+        while position < end:
+            line = fd.readline()
+            if not line:
+                break
+
+            position += len(line)
+            yield line.decode("utf-8")
+
+
+def convert_range(job):
+    config, headers, in_file, out_file, start, end = job
+    convert = compile_converter(config, headers)
+    n_rows = 0
+
+    with out_file.open("w", encoding="utf-8") as fd_out:
+        for row in csv.reader(read_lines(in_file, start, end)):
+            fd_out.write(convert(row))
+            n_rows += 1
+
+    return n_rows
+
+
+def main_parallel(config, in_file, out_file, workers, keep_parts):
+    with in_file.open("r", encoding="utf-8", newline="") as fd:
+        headers = next(csv.reader(fd))
+
+    # several ranges per worker keep the pool busy when rows differ in size
+    ranges = get_byte_ranges(in_file, workers * 4)
+    part_files = [get_part_file(out_file, i) for i in range(len(ranges))]
+    jobs = [
+        (config, headers, in_file, part_file, start, end)
+        for part_file, (start, end) in zip(part_files, ranges)
+    ]
+
+    try:
+        with Pool(workers) as pool, tqdm(total=config["total"]) as progress:
+            for n_rows in pool.imap_unordered(convert_range, jobs):
+                progress.update(n_rows)
+    except BaseException:
+        # no partial output is left behind when a worker fails
+        for part_file in part_files:
+            part_file.unlink(missing_ok=True)
+        raise
+
+    if keep_parts:
+        return
+
+    # part files are numbered by byte offset so the output order
+    # is the same as the one of the single process conversion
+    with out_file.open("wb") as fd_out:
+        for part_file in part_files:
+            with part_file.open("rb") as fd_part:
+                shutil.copyfileobj(fd_part, fd_out)
+            part_file.unlink()
+
+
+def generate_synthetic_rows(config, n_rows):
+    # random values matching the declared field types of the config
+    headers = list(config["fields"]["copy"])
+    if "pk" in config and config["pk"] not in headers:
+        headers.append(config["pk"])
+
+    def generate(meta):
+        field_type = meta.split(":", 1)[0]
+        if random.random() < 0.1:
+            return ""
+        if field_type == "int":
+            return str(random.randint(1, 10_000_000))
+        if field_type == "float":
+            return f"{random.uniform(0, 1000):.2f}"
+        if field_type == "str":
+            return random.choice(["mmHg", "bpm", "Normal <3 secs", "___"])
+        return "2180-07-23 14:00:00"
+
+    metas = [config["fields"]["copy"].get(h, "int") for h in headers]
+    rows = [[generate(meta) for meta in metas] for _ in range(n_rows)]
+    return headers, rows
+
+
+def benchmark(config, n_rows):
+    headers, rows = generate_synthetic_rows(config, n_rows)
+    convert = compile_converter(config, headers)
+
+    candidates = [
+        ("reference", lambda row: convert_row(config, headers, row)),
+        ("compiled", convert),
+    ]
+    for name, fn in candidates:
+        started = time.perf_counter()
+        for row in rows:
+            fn(row)
+        elapsed = time.perf_counter() - started
+        print(f"{name:>10}: {n_rows / elapsed:,.0f} rows/sec")
+
+
 def main(args):
     config = get_config(args.config)
+
+    if args.benchmark > 0:
+        benchmark(config, args.benchmark)
+        return
+
     in_file = Path(config["csv"])
     out_file = in_file.with_suffix(".jsonl")
 
-    with in_file.open("r", encoding="utf-8") as fd_in, out_file.open(
+    if args.workers > 1:
+        main_parallel(config, in_file, out_file, args.workers, args.keep_parts)
+        return
+
+    # `newline=""` keeps the line breaks inside quoted values as they are
+    # (as the byte ranges of the parallel conversion do)
+    with in_file.open("r", encoding="utf-8", newline="") as fd_in, out_file.open(
         "w", encoding="utf-8"
     ) as fd_out:
         reader = csv.reader(fd_in)
-        headers = next(reader)
+        convert = compile_converter(config, next(reader))
 
         for row in tqdm(reader, total=config["total"]):
-            assert len(headers) == len(row)
-
-            # convert csv row to a python dictionary
-            row_as_dict = {k: v for k, v in zip(headers, row)}
-
-            # initialize fixture data
-            data = {
-                "model": config["model"],
-                "fields": {},
-            }
-
-            # add optional primary key if defined
-            if "pk" in config:
-                data["pk"] = row_as_dict[config["pk"]]
-
-            # copy required fields
-            for field_name, meta in config["fields"]["copy"].items():
-                # parse meta information
-                meta = meta.split(":", 1)
-                field_type = meta[0]
-                rename_to = x if len(meta) == 2 and (x := meta[1]) else field_name
-
-                # optional values must be transformed to None
-                value = row_as_dict[field_name]
-                if not value:
-                    if field_type == "str":
-                        value = ""
-                    else:
-                        value = None
-
-                # perform type conversion (if necessary)
-                if value is not None:
-                    if field_type == "int":
-                        value = int(float(value))
-                    elif field_type == "float":
-                        value = float(value)
-
-                # add field
-                data["fields"][rename_to] = value
-
             # dump json object to output file
-            fd_out.write(json.dumps(data, ensure_ascii=False) + "\n")
+            fd_out.write(convert(row))
 
 
 if __name__ == "__main__":
@@ -1,10 +1,20 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime
-from id_validator import validator
+from id_validator import data as id_data
+from multiprocessing import Pool
 from pathlib import Path
+from typing import Callable, NamedTuple
 
 import argparse
+import hashlib
+import json
+import numpy as np
+import os
 import pandas as pd
-import random
+import threading
+import time
 import generators
 
 NOW = datetime.now()
@@ -24,49 +34,133 @@ def parse_args():
         default=500_000,
         help="The chunk size to be used for processing large CSV files like labevents and chartevents.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="The number of processes used for filtering labevents and chartevents.",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=["csv", "parquet"],
+        default="csv",
+        help="The file format of the intermediate files (parquet requires pyarrow).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue labevents and chartevents from their last finished chunk.",
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=list(STAGES),
+        default=list(STAGES),
+        help="The stages to run (stages they depend on are run when invalidated).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="The random seed used when generating fake patient information.",
+    )
 
     return parser.parse_args()
 
 
-def generate_chinese_name(gender):
-    # generate surname
-    index = random.randint(0, len(generators.SURNAMES) - 1)
-    surname = generators.SURNAMES[index]
-
-    # generate first name (male)
-    n_firstname_chars = random.choice([1, 2])
-    if gender == "M":
-        if n_firstname_chars == 2:
-            index = random.randint(0, len(generators.MALE_TWO_CHARS) - 1)
-            name = generators.MALE_TWO_CHARS[index]
-        else:
-            index = random.randint(0, len(generators.MALE_ONE_CHAR) - 1)
-            name = generators.MALE_ONE_CHAR[index]
-    else:
-        if n_firstname_chars == 2:
-            index = random.randint(0, len(generators.FEMALE_TWO_CHARS) - 1)
-            name = generators.FEMALE_TWO_CHARS[index]
-        else:
-            index = random.randint(0, len(generators.FEMALE_ONE_CHAR) - 1)
-            name = generators.FEMALE_ONE_CHAR[index]
-
-    return surname + name
-
-
-def generate_national_id(age, gender):
-    sex = 1 if gender == "M" else 0
-    birth_year = str(NOW.year - age)
-    is_valid = False
-
-    while not is_valid:
-        _id = validator.fake_id(birthday=birth_year, sex=sex)
-
-        # `validator.fake_id` sometimes generates incorrect birth year
-        # also make sure that gender is correctly generated
-        if _id[6:10] == birth_year and int(_id[-2]) % 2 == sex:
-            is_valid = True
+def get_name_tables():
+    # all first name tables are concatenated into a single array, so one
+    # index per row can address any of them through the table offsets
+    # (tables are ordered by [gender is male] * 2 + [two characters])
+    tables = [
+        generators.FEMALE_ONE_CHAR,
+        generators.FEMALE_TWO_CHARS,
+        generators.MALE_ONE_CHAR,
+        generators.MALE_TWO_CHARS,
+    ]
+    sizes = np.array([len(table) for table in tables])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    first_names = np.array([name for table in tables for name in table])
+    return np.array(generators.SURNAMES), first_names, offsets, sizes
+
+
+def generate_chinese_names(genders: np.ndarray, seed=None) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    surnames, first_names, offsets, sizes = get_name_tables()
+
+    # one uniform draw per row for the surname, the name length and the name
+    draws = rng.random((len(genders), 3))
+    tables = (np.asarray(genders) == "M") * 2 + (draws[:, 1] < 0.5)
+    surname_indices = (draws[:, 0] * len(surnames)).astype(np.int64)
+    name_indices = offsets[tables] + (draws[:, 2] * sizes[tables]).astype(np.int64)
+
+    return np.char.add(surnames[surname_indices], first_names[name_indices])
+
+
+def get_region_codes():
+    # district level address codes that `validator.is_valid` accepts
+    # (in non-strict mode any code listed in the timeline is valid, no
+    # matter the birth date, as long as its province is listed as well)
+    timeline = id_data.get_address_code_timeline()
+    codes = [
+        code
+        for code, entries in timeline.items()
+        if code[0] != "8"
+        and code[4:] != "00"
+        and entries[0]["address"]
+        and code[:2] + "0000" in timeline
+    ]
+    return np.array([list(map(int, code)) for code in codes], dtype=np.int64)
+
+
+# ISO 7064 MOD 11-2 weights of the first 17 digits
+CHECKSUM_WEIGHTS = np.array([pow(2, 17 - i, 11) for i in range(17)], dtype=np.int64)
+
+
+def to_digits(values: np.ndarray, width: int) -> np.ndarray:
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return (values[:, None] // powers) % 10
+
+
+def generate_national_ids(
+    ages: np.ndarray, genders: np.ndarray, seed=None
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    n = len(ages)
+    sex = (np.asarray(genders) == "M").astype(np.int64)
+
+    # region code (6 digits)
+    region_codes = get_region_codes()
+    regions = region_codes[rng.integers(0, len(region_codes), n)]
+
+    # random birth date within the birth year (but never in the future)
+    years = (NOW.year - np.asarray(ages, dtype=np.int64) - 1970).astype("datetime64[Y]")
+    first_days = years.astype("datetime64[D]")
+    end_days = np.minimum(
+        (years + 1).astype("datetime64[D]"), np.datetime64(NOW.date()) + 1
+    )
+    n_days = np.maximum((end_days - first_days).astype(np.int64), 1)
+    birthdays = pd.DatetimeIndex(first_days + rng.integers(0, n_days))
+    birthdays = birthdays.year * 10000 + birthdays.month * 100 + birthdays.day
+
+    # sequence code (3 digits) whose last digit is odd for males
+    orders = rng.integers(50, 500, n) * 2 + sex
+
+    # checksum digit (10 is written as "X")
+    body = np.hstack(
+        [
+            regions,
+            to_digits(np.asarray(birthdays, dtype=np.int64), 8),
+            to_digits(orders, 3),
+        ]
+    )
+    checks = (12 - (body @ CHECKSUM_WEIGHTS) % 11) % 11
 
-    return _id
+    chars = np.empty((n, 18), dtype=np.uint8)
+    chars[:, :17] = body + ord("0")
+    chars[:, 17] = np.where(checks == 10, ord("X"), checks + ord("0"))
+    return chars.view("S18").ravel().astype(str)
 
 
 def choose_best_year(anchor_year_group: str) -> int:
@@ -80,19 +174,30 @@ def choose_best_year(anchor_year_group: str) -> int:
     return start
 
 
-def adjust_year(series: pd.Series, anchor: pd.Series, chosen: pd.Series):
-    _years = series.str.split("-").str[0].astype("float")
-    _real_year = (_years - anchor + chosen).apply(lambda x: f"{x:.0f}")
-    return _real_year + series.str.slice(start=4)
-
+def shift_years(series: pd.Series, anchor: pd.Series, chosen: pd.Series):
+    # parse once and shift by whole years using month arithmetic on
+    # datetime64 values (the day of month and time of day are kept as is)
+    parsed = pd.to_datetime(series, errors="coerce")
+    months = parsed.to_numpy().astype("datetime64[M]")
+    offsets = parsed.to_numpy() - months.astype(parsed.dtype)
+    years = (chosen - anchor).to_numpy().astype("timedelta64[Y]")
+    shifted_months = months + years.astype("timedelta64[M]")
+
+    # a Feb 29 shifted into a non-leap year would overflow to Mar 1
+    # (e.g. 2017-02-29), so these dates are flagged as invalid, as are
+    # the (non-empty) values which could not be parsed at all
+    shifted = shifted_months.astype(parsed.dtype) + offsets
+    is_invalid = parsed.notna().to_numpy() & (
+        shifted.astype("datetime64[M]") != shifted_months
+    )
+    is_invalid |= series.notna().to_numpy() & parsed.isna().to_numpy()
+    shifted[is_invalid] = np.datetime64("NaT")
 
-def remove_patients(csvfile: str, patient_subject_ids: pd.Series):
-    df = pd.read_csv(csvfile)
-    df = df[~df["subject_id"].isin(patient_subject_ids)]
-    df.to_csv(csvfile, index=False)
+    index = series.index
+    return pd.Series(shifted, index=index), pd.Series(is_invalid, index=index)
 
 
-def preprocess_patients(root: Path):
+def preprocess_patients(root: Path, excluded: set, seed: int = None):
     # load admissions table to get patient ethnicity mapping
     df = pd.read_csv(root / "core" / "admissions.csv")
     df["ethnicity"] = df["ethnicity"].str.lower()
@@ -106,12 +211,11 @@ def preprocess_patients(root: Path):
     # generate fake national ID with the same age as the patient
     df["chosen_anchor_year"] = df["anchor_year_group"].apply(choose_best_year)
     df["real_age"] = NOW.year - df["chosen_anchor_year"] + df["anchor_age"]
-    df["national_id"] = df.apply(
-        lambda x: generate_national_id(x["real_age"], x["gender"]), axis=1
-    )
+    rng = np.random.default_rng(seed)
+    df["national_id"] = generate_national_ids(df["real_age"], df["gender"], rng)
 
     # generate random chinese names
-    df["name"] = df["gender"].apply(lambda x: generate_chinese_name(x))
+    df["name"] = generate_chinese_names(df["gender"], rng)
 
     # generate patient ethnicity
     df["ethnicity"] = df["subject_id"].map(
@@ -119,18 +223,17 @@ def preprocess_patients(root: Path):
     )
 
     # adjust dod time (remove patients with invalid dod)
-    df["dod"] = adjust_year(df["dod"], df["anchor_year"], df["chosen_anchor_year"])
-    is_invalid = ~df["dod"].isna() & pd.to_datetime(df["dod"], errors="coerce").isna()
-    tbd_patient_subject_ids = df.loc[is_invalid, "subject_id"]
-    df = df[~df["subject_id"].isin(tbd_patient_subject_ids)]
+    df["dod"], is_invalid = shift_years(
+        df["dod"], df["anchor_year"], df["chosen_anchor_year"]
+    )
+    excluded.update(df.loc[is_invalid, "subject_id"])
 
-    # output to csv
-    df.to_csv("pp-patients.csv", index=False)
+    return df
 
 
-def preprocess_admissions(root: Path):
-    # load preprocessed patients csv and get mappings
-    df = pd.read_csv("pp-patients.csv")
+def preprocess_admissions(root: Path, patients: pd.DataFrame, excluded: set):
+    # get mappings from the preprocessed patients
+    df = patients
     _anchor = dict(zip(df["subject_id"], df["anchor_year"]))
     _chosen = dict(zip(df["subject_id"], df["chosen_anchor_year"]))
     _patients = df["subject_id"]
@@ -141,51 +244,28 @@ def preprocess_admissions(root: Path):
     df = df[df["subject_id"].isin(_patients)]
 
     # convert mappings to auxiliary series
-    _anchor = df["subject_id"].apply(lambda x: _anchor[x])
-    _chosen = df["subject_id"].apply(lambda x: _chosen[x])
+    _anchor = df["subject_id"].map(_anchor)
+    _chosen = df["subject_id"].map(_chosen)
 
     # adjust admit, discharge, and death times
-    df["admittime"] = adjust_year(df["admittime"], _anchor, _chosen)
-    df["dischtime"] = adjust_year(df["dischtime"], _anchor, _chosen)
-    df["deathtime"] = adjust_year(df["deathtime"], _anchor, _chosen)
-    df["edregtime"] = adjust_year(df["edregtime"], _anchor, _chosen)
-    df["edouttime"] = adjust_year(df["edouttime"], _anchor, _chosen)
-
     # there will be invalid dates (e.g. 2017-02-29)
     # so patients with these admission dates are simply deleted :)
-    is_invalid = (
-        pd.to_datetime(df["admittime"], errors="coerce").isna()
-        | pd.to_datetime(df["dischtime"], errors="coerce").isna()
-        | (
-            ~df["deathtime"].isna()
-            & pd.to_datetime(df["deathtime"], errors="coerce").isna()
-        )
-        | (
-            ~df["edregtime"].isna()
-            & pd.to_datetime(df["edregtime"], errors="coerce").isna()
-        )
-        | (
-            ~df["edouttime"].isna()
-            & pd.to_datetime(df["edouttime"], errors="coerce").isna()
-        )
-    )
-    tbd_patient_subject_ids = df.loc[is_invalid, "subject_id"]
-    df = df[~df["subject_id"].isin(tbd_patient_subject_ids)]
+    is_invalid = df["admittime"].isna() | df["dischtime"].isna()
+    for column in ["admittime", "dischtime", "deathtime", "edregtime", "edouttime"]:
+        df[column], invalid = shift_years(df[column], _anchor, _chosen)
+        is_invalid |= invalid
+    excluded.update(df.loc[is_invalid, "subject_id"])
 
     # transform admission type and marital status
     df["admission_type"] = df["admission_type"].str.lower()
     df["marital_status"] = df["marital_status"].str.lower()
 
-    # output to csv
-    df.to_csv("pp-admissions.csv", index=False)
+    return df
 
-    if not tbd_patient_subject_ids.empty:
-        remove_patients("pp-patients.csv", tbd_patient_subject_ids)
 
-
-def preprocess_icustays(root: Path):
-    # load preprocessed patients csv and get mappings
-    df = pd.read_csv("pp-patients.csv")
+def preprocess_icustays(root: Path, patients: pd.DataFrame, excluded: set):
+    # get mappings from the preprocessed patients
+    df = patients
     _anchor = dict(zip(df["subject_id"], df["anchor_year"]))
     _chosen = dict(zip(df["subject_id"], df["chosen_anchor_year"]))
     _patients = df["subject_id"]
@@ -196,140 +276,551 @@ def preprocess_icustays(root: Path):
     df = df[df["subject_id"].isin(_patients)]
 
     # convert mappings to auxiliary series
-    _anchor = df["subject_id"].apply(lambda x: _anchor[x])
-    _chosen = df["subject_id"].apply(lambda x: _chosen[x])
+    _anchor = df["subject_id"].map(_anchor)
+    _chosen = df["subject_id"].map(_chosen)
 
     # adjust in and out times
-    df["intime"] = adjust_year(df["intime"], _anchor, _chosen)
-    df["outtime"] = adjust_year(df["outtime"], _anchor, _chosen)
-
     # there will be invalid dates (e.g. 2017-02-29)
     # so patients with these admission dates are simply deleted :)
-    is_invalid = (
-        pd.to_datetime(df["intime"], errors="coerce").isna()
-        | pd.to_datetime(df["outtime"], errors="coerce").isna()
-    )
-    tbd_patient_subject_ids = df.loc[is_invalid, "subject_id"]
-    df = df[~df["subject_id"].isin(tbd_patient_subject_ids)]
+    is_invalid = df["intime"].isna() | df["outtime"].isna()
+    for column in ["intime", "outtime"]:
+        df[column], invalid = shift_years(df[column], _anchor, _chosen)
+        is_invalid |= invalid
+    excluded.update(df.loc[is_invalid, "subject_id"])
 
-    # output to csv
-    df.to_csv("pp-icustays.csv", index=False)
+    return df
 
-    if not tbd_patient_subject_ids.empty:
-        remove_patients("pp-patients.csv", tbd_patient_subject_ids)
-        remove_patients("pp-admissions.csv", tbd_patient_subject_ids)
 
+def get_artifact_path(name: str, fmt: str) -> Path:
+    return Path(f"{name}.{fmt}")
 
-def preprocess_labevents(root: Path, chunk_size: int = 500_000):
-    # load preprocessed patients csv and get mappings
-    # df = pd.read_csv("pp-patients.csv")
-    # _anchor = dict(zip(df["subject_id"], df["anchor_year"]))
-    # _chosen = dict(zip(df["subject_id"], df["chosen_anchor_year"]))
-    # _patients = df["subject_id"]
-    patient_ids = pd.read_pickle("patient_ids.pkl")
 
-    # load admissions csv and delete rows with subject_id
-    # that does not exist in pp-patients
-    for i, df in enumerate(
-        pd.read_csv(
-            root / "hosp" / "labevents.csv",
-            iterator=True,
-            chunksize=chunk_size,
-        )
-    ):
-        df = df[df["subject_id"].isin(patient_ids)]
-
-        # convert mappings to auxiliary series
-        # _df_anchor = df["subject_id"].apply(lambda x: _anchor[x])
-        # _df_chosen = df["subject_id"].apply(lambda x: _chosen[x])
-
-        # adjust `charttime` and `storetime` times
-        # df["charttime"] = adjust_year(df["charttime"], _df_anchor, _df_chosen)
-        # df["storetime"] = adjust_year(df["storetime"], _df_anchor, _df_chosen)
-        # is_invalid = pd.to_datetime(df["charttime"], errors="coerce").isna() | (
-        #     ~df["storetime"].isna()
-        #     & pd.to_datetime(df["storetime"], errors="coerce").isna()
-        # )
-        # tbd_patient_subject_ids = df.loc[is_invalid, "subject_id"]
-        # df = df[~df["subject_id"].isin(tbd_patient_subject_ids)]
-
-        # output to csv
-        if i == 0:
-            df.to_csv("pp-labevents-new.csv", index=False)
-        else:
-            df.to_csv("pp-labevents-new.csv", index=False, header=None, mode="a")
-
-        # if not tbd_patient_subject_ids.empty:
-        #     remove_patients("pp-patients.csv", tbd_patient_subject_ids)
-        #     remove_patients("pp-admissions.csv", tbd_patient_subject_ids)
-        #     remove_patients("pp-icustays.csv", tbd_patient_subject_ids)
-
-
-def preprocess_chartevents(root: Path, chunk_size: int = 500_000):
-    # load preprocessed patients csv and get mappings
-    # df = pd.read_csv("pp-patients.csv")
-    # _anchor = dict(zip(df["subject_id"], df["anchor_year"]))
-    # _chosen = dict(zip(df["subject_id"], df["chosen_anchor_year"]))
-    # _patients = df["subject_id"]
-    patient_ids = pd.read_pickle("patient_ids.pkl")
+def write_frame(df: pd.DataFrame, name: str, fmt: str):
+    path = get_artifact_path(name, fmt)
+    if fmt == "parquet":
+        df.to_parquet(path, index=False, compression="zstd")
+    else:
+        df.to_csv(path, index=False)
 
-    # load admissions csv and delete rows with subject_id
-    # that does not exist in pp-patients
-    for i, df in enumerate(
-        pd.read_csv(
-            "pp-chartevents.csv",
-            iterator=True,
-            chunksize=chunk_size,
+
+def read_frame(name: str, fmt: str, columns: list = None):
+    # parquet files are read with column pruning (only the requested
+    # column chunks are decoded)
+    path = get_artifact_path(name, fmt)
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns)
+
+    return pd.read_csv(path, usecols=columns)
+
+
+# content hashes are cached by file size and modification time,
+# so unchanged multi-gigabyte inputs are only hashed once
+HASH_CACHE = Path(".pp-hashes.json")
+HASH_CACHE_LOCK = threading.Lock()
+
+
+def load_hash_cache() -> dict:
+    return json.loads(HASH_CACHE.read_text()) if HASH_CACHE.exists() else {}
+
+
+def hash_file(path: Path) -> str:
+    # parquet event outputs are directories of part files
+    paths = (
+        sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    )
+    with HASH_CACHE_LOCK:
+        cache = load_hash_cache()
+
+    entries = {}
+    for p in paths:
+        key, stat = str(p.resolve()), p.stat()
+        entry = cache.get(key)
+        if entry is None or entry[:2] != [stat.st_size, stat.st_mtime_ns]:
+            file_digest = hashlib.blake2b(digest_size=16)
+            with p.open("rb") as fd:
+                while block := fd.read(1 << 23):
+                    file_digest.update(block)
+            entry = [stat.st_size, stat.st_mtime_ns, file_digest.hexdigest()]
+        entries[key] = entry
+
+    # stages may run concurrently, so the cache is re-read before updating
+    with HASH_CACHE_LOCK:
+        cache = load_hash_cache()
+        cache.update(entries)
+        save_json(HASH_CACHE, cache)
+
+    digest = hashlib.blake2b(digest_size=16)
+    for entry in entries.values():
+        digest.update(entry[2].encode())
+    return digest.hexdigest()
+
+
+def save_json(path: Path, data):
+    # write atomically, so a crash never leaves a truncated file behind
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(data, indent=2))
+    os.replace(tmp, path)
+
+
+def get_manifest_path(name: str) -> Path:
+    return Path(f"{name}.manifest.json")
+
+
+def load_manifest(name: str, fingerprint: dict):
+    # a manifest is only valid for the same inputs and parameters
+    path = get_manifest_path(name)
+    if not path.exists():
+        return None
+
+    manifest = json.loads(path.read_text())
+    return manifest if manifest["fingerprint"] == fingerprint else None
+
+
+def materialize(outputs: dict, excluded: set, fmt: str = "csv"):
+    # patients excluded by any of the stages are removed from every
+    # output at once, so each file is written exactly once
+    for name, df in outputs.items():
+        write_frame(df[~df["subject_id"].isin(excluded)], name, fmt)
+
+
+# compact dtypes of the event tables (date/time columns are kept as text)
+EVENT_DTYPES = {
+    "labevents": {
+        "labevent_id": "int64",
+        "subject_id": "int32",
+        "hadm_id": "Int32",
+        "specimen_id": "int64",
+        "itemid": "int32",
+        "charttime": "object",
+        "storetime": "object",
+        "value": "object",
+        "valuenum": "float64",
+        "valueuom": "category",
+        "ref_range_lower": "float64",
+        "ref_range_upper": "float64",
+        "flag": "category",
+        "priority": "category",
+        "comments": "object",
+    },
+    "chartevents": {
+        "subject_id": "int32",
+        "hadm_id": "int32",
+        "stay_id": "int32",
+        "charttime": "object",
+        "storetime": "object",
+        "itemid": "int32",
+        "value": "object",
+        "valuenum": "float64",
+        "valueuom": "category",
+        "warning": "Int8",
+    },
+}
+
+ARROW_TYPES = {
+    "int64": "int64",
+    "int32": "int32",
+    "Int32": "int32",
+    "Int8": "int8",
+    "float64": "float64",
+    "object": "string",
+    "category": "string",
+}
+
+
+def get_arrow_schema(dtypes: dict):
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            (name, pa.type_for_alias(ARROW_TYPES[dtype]))
+            for name, dtype in dtypes.items()
+        ]
+    )
+
+
+# set once per worker process by `init_filter_worker`
+PATIENT_IDS = None
+
+
+def init_filter_worker(patient_ids):
+    global PATIENT_IDS
+    PATIENT_IDS = pd.Index(patient_ids)
+
+
+def filter_chunk(df: pd.DataFrame, schema=None):
+    # filtering and (the rather slow) CSV formatting or arrow
+    # conversion happen in the workers
+    n_rows = len(df)
+    df = df[df["subject_id"].isin(PATIENT_IDS)]
+
+    if schema is not None:
+        import pyarrow as pa
+
+        return n_rows, len(df), pa.Table.from_pandas(df, schema, preserve_index=False)
+
+    return n_rows, len(df), df.to_csv(index=False, header=False)
+
+
+def has_chunks(path: Path, fmt: str, chunks: list) -> bool:
+    # whether the output still holds every chunk recorded in the manifest
+    if not path.exists():
+        return False
+    if fmt == "parquet":
+        return all((path / chunk["part"]).is_file() for chunk in chunks)
+    return not chunks or path.stat().st_size >= chunks[-1]["offset"]
+
+
+@contextmanager
+def open_events_writer(path: Path, fmt: str, columns: list, chunks: list):
+    # every write is durable before its chunk is recorded in the manifest,
+    # and output past the last recorded chunk is discarded when resuming
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        # a parquet file is unreadable until closed, so every chunk
+        # is written as a separate part file of a dataset directory
+        path.mkdir(exist_ok=True)
+        finished = {chunk["part"] for chunk in chunks}
+        for part in path.glob("part-*.parquet"):
+            if part.name not in finished:
+                part.unlink()
+
+        def write(i, table):
+            part = f"part-{i:05d}.parquet"
+            pq.write_table(table, path / part, compression="zstd")
+            return {"part": part}
+
+        yield write
+        return
+
+    if chunks:
+        os.truncate(path, chunks[-1]["offset"])
+
+    with path.open("ab" if chunks else "wb") as fd:
+        if not chunks:
+            fd.write((",".join(columns) + "\n").encode("utf-8"))
+
+        def write(i, text):
+            fd.write(text.encode("utf-8"))
+            fd.flush()
+            os.fsync(fd.fileno())
+            return {"offset": fd.tell()}
+
+        yield write
+
+
+def filter_events(
+    csvfile: Path,
+    name: str,
+    table: str,
+    chunk_size: int,
+    workers: int,
+    fmt: str = "csv",
+    resume: bool = False,
+):
+    path = get_artifact_path(name, fmt)
+    fingerprint = {
+        "inputs": [
+            hash_file(csvfile),
+            hash_file(get_artifact_path("pp-patients", fmt)),
+        ],
+        "chunk_size": chunk_size,
+        "format": fmt,
+    }
+
+    # skip the stage if its inputs haven't changed since the last run
+    manifest = load_manifest(name, fingerprint)
+    if manifest and manifest["complete"] and path.exists():
+        print(f"[{table}] inputs unchanged, skipping")
+        return
+
+    # when resuming, continue after the last finished chunk (the manifest
+    # is rewritten before the output is touched, so a crash of a fresh run
+    # never leaves chunks behind which are no longer in the output)
+    chunks = []
+    if manifest and resume and has_chunks(path, fmt, manifest["chunks"]):
+        chunks = manifest["chunks"]
+    manifest = {"fingerprint": fingerprint, "complete": False, "chunks": chunks}
+    save_json(get_manifest_path(name), manifest)
+    n_skipped = sum(chunk["rows"] for chunk in chunks)
+    if chunks:
+        print(f"[{table}] resuming after {len(chunks)} chunks ({n_skipped:,} rows)")
+
+    # the C parser skips rows without converting them (quotes are respected)
+    dtypes = EVENT_DTYPES[table]
+    header = pd.read_csv(csvfile, nrows=0).columns.tolist()
+    columns = [column for column in header if column in dtypes]
+    schema = get_arrow_schema(dtypes) if fmt == "parquet" else None
+    reader = pd.read_csv(
+        csvfile,
+        header=None,
+        names=header,
+        skiprows=n_skipped + 1,
+        usecols=columns,
+        dtype=dtypes,
+        iterator=True,
+        chunksize=chunk_size,
+    )
+
+    # at most a few chunks are in flight at a time (`Pool.imap` would read
+    # the whole file ahead), and results are written in the input order
+    max_pending = workers * 2
+    pending = deque()
+    started = time.perf_counter()
+    n_total = 0
+
+    def write_next():
+        nonlocal n_total
+        i, submitted, result = pending.popleft()
+        n_rows, n_kept, data = result.get()
+        written = write(i, data)
+
+        # record the chunk only after its output has been written
+        chunks.append({"index": i, "rows": n_rows, "kept": n_kept, **written})
+        save_json(get_manifest_path(name), manifest)
+
+        n_total += n_rows
+        elapsed = time.perf_counter()
+        print(
+            f"[{table}] chunk {i}: {n_kept:,}/{n_rows:,} rows kept "
+            f"({n_rows / (elapsed - submitted):,.0f} rows/sec, "
+            f"{n_total / (elapsed - started):,.0f} rows/sec overall)"
         )
-    ):
-        df = df[df["subject_id"].isin(patient_ids)]
-
-        # convert mappings to auxiliary series
-        # _df_anchor = df["subject_id"].apply(lambda x: _anchor[x])
-        # _df_chosen = df["subject_id"].apply(lambda x: _chosen[x])
-
-        # adjust `charttime` and `storetime` times
-        # df["charttime"] = adjust_year(df["charttime"], _df_anchor, _df_chosen)
-        # df["storetime"] = adjust_year(df["storetime"], _df_anchor, _df_chosen)
-        # is_invalid = (
-        #     ~df["charttime"].isna()
-        #     & pd.to_datetime(df["charttime"], errors="coerce").isna()
-        # ) | (
-        #     ~df["storetime"].isna()
-        #     & pd.to_datetime(df["storetime"], errors="coerce").isna()
-        # )
-        # tbd_patient_subject_ids = df.loc[is_invalid, "subject_id"]
-        # df = df[~df["subject_id"].isin(tbd_patient_subject_ids)]
-
-        # output to csv
-        if i == 0:
-            df.to_csv("pp-chartevents-new.csv", index=False)
-        else:
-            df.to_csv("pp-chartevents-new.csv", index=False, header=None, mode="a")
-
-        # if not tbd_patient_subject_ids.empty:
-        #     remove_patients("pp-patients.csv", tbd_patient_subject_ids)
-        #     remove_patients("pp-admissions.csv", tbd_patient_subject_ids)
-        #     remove_patients("pp-icustays.csv", tbd_patient_subject_ids)
 
+    patient_ids = read_patient_ids(fmt)
+    with Pool(
+        workers, initializer=init_filter_worker, initargs=(patient_ids,)
+    ) as pool, open_events_writer(path, fmt, columns, list(chunks)) as write:
+        for i, df in enumerate(reader, start=len(chunks)):
+            submitted = time.perf_counter()
+            result = pool.apply_async(filter_chunk, (df, schema))
+            pending.append((i, submitted, result))
+            if len(pending) >= max_pending:
+                write_next()
+
+        while pending:
+            write_next()
+
+    manifest["complete"] = True
+    save_json(get_manifest_path(name), manifest)
+
+
+def read_patient_ids(fmt: str) -> pd.Series:
+    return read_frame("pp-patients", fmt, columns=["subject_id"])["subject_id"]
+
+
+def preprocess_labevents(
+    root: Path,
+    chunk_size: int = 500_000,
+    workers: int = 1,
+    fmt: str = "csv",
+    resume: bool = False,
+):
+    # only keep lab events of the preprocessed patients
+    filter_events(
+        root / "hosp" / "labevents.csv",
+        "pp-labevents-new",
+        "labevents",
+        chunk_size,
+        workers,
+        fmt=fmt,
+        resume=resume,
+    )
+
+
+def preprocess_chartevents(
+    root: Path,
+    chunk_size: int = 500_000,
+    workers: int = 1,
+    fmt: str = "csv",
+    resume: bool = False,
+):
+    # only keep chart events of the preprocessed patients
+    filter_events(
+        Path("pp-chartevents.csv"),
+        "pp-chartevents-new",
+        "chartevents",
+        chunk_size,
+        workers,
+        fmt=fmt,
+        resume=resume,
+    )
+
+
+def run_patients(root: Path, params: dict, deps: dict):
+    excluded = set()
+    return preprocess_patients(root, excluded, seed=params["seed"]), excluded
 
-def main(args):
-    # set MIMIC-IV dataset root path
-    root = Path(args.root).expanduser()
-    assert root.is_dir()
 
+def run_admissions(root: Path, params: dict, deps: dict):
+    excluded = set()
+    patients, _ = deps["patients"]
+    return preprocess_admissions(root, patients, excluded), excluded
+
+
+def run_icustays(root: Path, params: dict, deps: dict):
+    excluded = set()
+    patients, _ = deps["patients"]
+    return preprocess_icustays(root, patients, excluded), excluded
+
+
+def run_tables(root: Path, params: dict, deps: dict):
+    excluded = set().union(*(excluded for _, excluded in deps.values()))
+    outputs = {f"pp-{name}": df for name, (df, _) in deps.items()}
+    materialize(outputs, excluded, fmt=params["fmt"])
+
+
+def get_event_options(params: dict):
+    keys = ["chunk_size", "workers", "fmt", "resume"]
+    return {key: params[key] for key in keys}
+
+
+def run_labevents(root: Path, params: dict, deps: dict):
+    preprocess_labevents(root, **get_event_options(params))
+
+
+def run_chartevents(root: Path, params: dict, deps: dict):
+    preprocess_chartevents(root, **get_event_options(params))
+
+
+class Stage(NamedTuple):
+    run: Callable
+    deps: tuple = ()
+    # files (relative to the MIMIC-IV root) and parameters the output depends on
+    inputs: tuple = ()
+    params: tuple = ()
+    # artifacts that have to exist for a cached result to be reused
+    outputs: tuple = ()
+    # the event stages keep their own chunk level checkpoints (manifests)
+    cached: bool = True
+    # stages with a process pool of `--workers` processes (and as many
+    # chunks in flight) run one at a time, so they never oversubscribe
+    # the cores or the memory
+    pooled: bool = False
+
+
+STAGES = {
     # generate realistic national IDs for all patients (wrt. gender, dob)
     # random chinese names are also given for all of the patients
-    # preprocess_patients(root)
-
+    "patients": Stage(
+        run_patients,
+        inputs=("core/patients.csv", "core/admissions.csv"),
+        params=("seed",),
+    ),
     # adjust shifted dates of all the admissions
     # and icustays (wrt. patient's anchor year)
-    # preprocess_admissions(root)
-    # preprocess_icustays(root)
+    "admissions": Stage(
+        run_admissions, deps=("patients",), inputs=("core/admissions.csv",)
+    ),
+    "icustays": Stage(run_icustays, deps=("patients",), inputs=("icu/icustays.csv",)),
+    # remove excluded patients and write the tables
+    "tables": Stage(
+        run_tables,
+        deps=("patients", "admissions", "icustays"),
+        params=("fmt",),
+        outputs=("pp-patients", "pp-admissions", "pp-icustays"),
+    ),
+    # filter labevents and chartevents of the preprocessed patients
+    "labevents": Stage(run_labevents, deps=("tables",), cached=False, pooled=True),
+    "chartevents": Stage(run_chartevents, deps=("tables",), cached=False, pooled=True),
+}
+
+CACHE_DIR = Path(".pp-cache")
+
+
+def get_stage_key(name: str, root: Path, params: dict, dep_keys: dict) -> str:
+    # a stage is invalidated by changes to its inputs, its parameters
+    # or any of its (transitive) dependencies
+    stage = STAGES[name]
+    data = {
+        "stage": name,
+        "inputs": [hash_file(root / path) for path in stage.inputs],
+        "params": {key: params[key] for key in stage.params},
+        "deps": [dep_keys[dep] for dep in stage.deps],
+    }
+    return hashlib.blake2b(
+        json.dumps(data, sort_keys=True).encode(), digest_size=16
+    ).hexdigest()
+
+
+def get_stage_ancestors(names: list) -> list:
+    selected, stack = set(), list(names)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(STAGES[name].deps)
+
+    # keep the declaration order (which is a topological order)
+    return [name for name in STAGES if name in selected]
+
+
+def run_stages(root: Path, params: dict, names: list):
+    CACHE_DIR.mkdir(exist_ok=True)
+    names = get_stage_ancestors(names)
+    keys, results = {}, {}
+
+    def get_cache_path(name):
+        return CACHE_DIR / f"{name}-{keys[name]}.pkl"
+
+    def get_result(name):
+        # results of cached stages are only loaded when a dependent reruns
+        if name not in results:
+            results[name] = pd.read_pickle(get_cache_path(name))
+        return results[name]
+
+    def run_stage(name):
+        stage = STAGES[name]
+        keys[name] = get_stage_key(name, root, params, keys)
+        cache_path = get_cache_path(name)
+        outputs = [get_artifact_path(o, params["fmt"]) for o in stage.outputs]
+
+        if stage.cached and cache_path.exists() and all(o.exists() for o in outputs):
+            print(f"[{name}] cached")
+            return
+
+        print(f"[{name}] running")
+        deps = {dep: get_result(dep) for dep in stage.deps}
+        result = stage.run(root, params, deps)
+
+        if stage.cached:
+            for stale in CACHE_DIR.glob(f"{name}-*.pkl"):
+                stale.unlink()
+            pd.to_pickle(result, cache_path)
+            results[name] = result
+
+    # stages whose dependencies are done run concurrently (e.g. admissions
+    # and icustays), threads are used since the event stages have their
+    # own process pools (only one of which is running at a time)
+    with ThreadPoolExecutor() as executor:
+        running, done = {}, set()
+        while len(done) < len(names):
+            for name in names:
+                ready = all(dep in done for dep in STAGES[name].deps)
+                if STAGES[name].pooled:
+                    ready &= not any(STAGES[x].pooled for x in running.values())
+                if name not in done and name not in running.values() and ready:
+                    running[executor.submit(run_stage, name)] = name
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                future.result()
+                done.add(running.pop(future))
+
+
+def main(args):
+    # set MIMIC-IV dataset root path
+    root = Path(args.root).expanduser()
+    assert root.is_dir()
 
-    # adjust shifted dates of all labevents and chartevents
-    preprocess_labevents(root, chunk_size=args.chunk_size)
-    preprocess_chartevents(root, chunk_size=args.chunk_size)
+    params = {
+        "seed": args.seed,
+        "fmt": args.format,
+        "chunk_size": args.chunk_size,
+        "workers": args.workers,
+        "resume": args.resume,
+    }
+    run_stages(root, params, args.stages)
 
 
 if __name__ == "__main__":